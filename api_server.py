@@ -2,26 +2,36 @@
 FastAPI Server for VieNeu-TTS
 Provides REST API endpoints for text-to-speech synthesis
 """
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List
-import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import json
+import struct
 import tempfile
 import torch
 import os
 import time
 import numpy as np
 import yaml
-from vieneu_tts import VieNeuTTS
+from vieneu_tts import VieNeuTTS, GGUFWorkerPool
 try:
     from vieneu_tts import FastVieNeuTTS
     LMDEPLOY_AVAILABLE = True
 except ImportError:
     LMDEPLOY_AVAILABLE = False
     FastVieNeuTTS = None
-from utils.core_utils import split_text_into_chunks
+from utils.core_utils import split_text_into_chunks, IncrementalTextChunker, StreamCrossfader
+from utils.batch_scheduler import BatchScheduler, SchedulerFullError
+from utils.audio_cache import AudioCache, audio_cache_key
+from utils.audio_encoding import audio_media_type, encode_audio
+from utils.model_pool import ModelPool, PooledModel, model_id, parse_model_id
+from utils.router import Engine, EngineRouter, LATENCY_CLASSES, LATENCY_PRIORITY, classify_request
 from functools import lru_cache
 import gc
 import base64
@@ -34,8 +44,30 @@ with open(CONFIG_PATH, "r", encoding="utf-8") as f:
 BACKBONE_CONFIGS = _config.get("backbone_configs", {})
 CODEC_CONFIGS = _config.get("codec_configs", {})
 VOICE_SAMPLES = _config.get("voice_samples", {})
+ROUTER_CONFIG = _config.get("router") or {}
 _text_settings = _config.get("text_settings", {})
 MAX_CHARS_PER_CHUNK = _text_settings.get("max_chars_per_chunk", 256)
+MAX_TOTAL_CHARS_STREAMING = _text_settings.get("max_total_chars_streaming", 5000)
+# Chunks from concurrent requests are batched together: at most BATCH_MAX_SIZE
+# per batch (0 = the model's max_batch_size), waiting at most BATCH_MAX_WAIT_MS
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "0"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "20"))
+# Admission control: synthesis requests in progress beyond MAX_ACTIVE_REQUESTS
+# get 429, and chunks waiting beyond MAX_QUEUED_CHUNKS get 503
+MAX_ACTIVE_REQUESTS = int(os.getenv("MAX_ACTIVE_REQUESTS", "64"))
+MAX_QUEUED_CHUNKS = int(os.getenv("MAX_QUEUED_CHUNKS", "256"))
+# Threads for blocking work around inference (model loading, reference encoding, audio files)
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+# Cache of synthesized chunks for requests with "cache": true; AUDIO_CACHE_DIR adds a disk tier
+AUDIO_CACHE_MB = float(os.getenv("AUDIO_CACHE_MB", "256"))
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR") or None
+# Models kept loaded side by side: at most MODEL_POOL_SIZE, within MODEL_POOL_MB
+# of estimated memory (0 = no memory limit); the least recently used is evicted first.
+# The default of 1 replaces the model on /load_model; raise it only with memory to spare
+MODEL_POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", "1"))
+MODEL_POOL_MB = float(os.getenv("MODEL_POOL_MB", "0"))
+# Loaded when a request needs a model and none was loaded with /load_model
+DEFAULT_MODEL = model_id("VieNeu-TTS (GPU)", "NeuCodec (Standard)", "Auto")
 
 # Initialize FastAPI
 app = FastAPI(
@@ -53,8 +85,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global model instance
-tts = None
+# Resident models; requests run on default_model unless they name another one
+model_pool = ModelPool(
+    max_models=MODEL_POOL_SIZE,
+    max_bytes=int(MODEL_POOL_MB * 2**20),
+    on_evict=lambda entry: cleanup_gpu_memory()
+)
+default_model = DEFAULT_MODEL
+# The default model, as reported by /status
 current_config = {
     "backbone": None,
     "codec": None,
@@ -63,19 +101,156 @@ current_config = {
     "using_lmdeploy": False
 }
 
+def create_scheduler(workers: int = 1) -> BatchScheduler:
+    # Every job names its model (see resolve_target)
+    return BatchScheduler(
+        lambda: None,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait=BATCH_MAX_WAIT_MS / 1000,
+        max_queued=MAX_QUEUED_CHUNKS,
+        workers=workers
+    )
+
+def create_router():
+    """Router over the engines in config.yaml, each with its own scheduler; None without engines"""
+    engines = [
+        Engine(
+            name,
+            engine_config["model"],
+            # A worker-pool engine runs as many chunks at once as it has worker processes
+            create_scheduler(engine_config.get("workers", 1)),
+            classes=engine_config.get("classes", LATENCY_CLASSES),
+            lmdeploy=engine_config.get("lmdeploy", False),
+            workers=engine_config.get("workers", 1)
+        )
+        for name, engine_config in (ROUTER_CONFIG.get("engines") or {}).items()
+    ]
+    if not engines:
+        return None
+    return EngineRouter(
+        engines,
+        short_text_chars=ROUTER_CONFIG.get("short_text_chars", 300),
+        max_pending=ROUTER_CONFIG.get("max_pending", 8)
+    )
+
+# All synthesis goes through a scheduler, which owns the models while they run:
+# the engines' own when requests are routed, else this shared one
+scheduler = create_scheduler()
+router = create_router()
+# Everything else that blocks runs here, keeping the event loop free for other requests
+blocking_executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="tts-blocking")
+# Model lookups that may load (and wait for other loads) run apart, so a load never holds up audio work
+model_load_executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="tts-model-load")
+active_requests = 0
+audio_cache = AudioCache(int(AUDIO_CACHE_MB * 2**20), disk_dir=AUDIO_CACHE_DIR)
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function in the blocking executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+async def run_model_load(func, *args, **kwargs):
+    """Like run_blocking, for functions that may load a model (resolve_target, resolve_model, _load_model)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(model_load_executor, functools.partial(func, *args, **kwargs))
+
+def acquire_request_slot():
+    """Count a synthesis request in, or reject it with 429 when MAX_ACTIVE_REQUESTS are already in progress"""
+    global active_requests
+    if active_requests >= MAX_ACTIVE_REQUESTS:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many requests in progress ({active_requests}), retry later",
+            headers={"Retry-After": "1"}
+        )
+    active_requests += 1
+
+def release_request_slot():
+    global active_requests
+    active_requests -= 1
+
+@asynccontextmanager
+async def admit_request():
+    """Hold a request slot (see acquire_request_slot) while the request runs"""
+    acquire_request_slot()
+    try:
+        yield
+    finally:
+        release_request_slot()
+
+class SynthesisTarget:
+    """Where a request's chunks run: a resident model, the scheduler to queue them on, and their priority"""
+    
+    def __init__(self, model: PooledModel, scheduler: BatchScheduler, priority: int):
+        self.model = model
+        self.scheduler = scheduler
+        self.priority = priority
+
+async def synthesize_chunks(target: SynthesisTarget, text_chunks: list, ref_codes, ref_text: str, batchable: bool,
+                            sampling: dict, use_cache: bool = False) -> list:
+    """
+    Synthesize chunks through the target's scheduler; 503 when its queue is full.
+    
+    With use_cache, chunks already in the audio cache are reused and only the
+    others are synthesized (and then cached). Without a seed in sampling,
+    cached audio is one random sample of the chunk.
+    """
+    if not use_cache:
+        missing = list(range(len(text_chunks)))
+        chunk_wavs = [None] * len(text_chunks)
+    else:
+        cache_model_id = f"{target.model.backbone}|{target.model.codec}"
+        keys = [audio_cache_key(chunk, ref_codes, ref_text, cache_model_id, **sampling) for chunk in text_chunks]
+        chunk_wavs = await run_blocking(lambda: [audio_cache.get(key) for key in keys])
+        missing = [i for i, wav in enumerate(chunk_wavs) if wav is None]
+    
+    if missing:
+        try:
+            wavs = await target.scheduler.synthesize(
+                [text_chunks[i] for i in missing], ref_codes, ref_text, batchable=batchable, sampling=sampling,
+                backend=target.model.tts, priority=target.priority
+            )
+        except SchedulerFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+        for i, wav in zip(missing, wavs):
+            chunk_wavs[i] = wav
+        if use_cache:
+            await run_blocking(lambda: [audio_cache.put(keys[i], chunk_wavs[i]) for i in missing])
+    return chunk_wavs
+
 # Pydantic models
-class TTSRequest(BaseModel):
+class SamplingParams(BaseModel):
+    temperature: float = Field(default=1.0, gt=0.0, le=2.0, description="Sampling temperature")
+    top_k: int = Field(default=50, ge=0, description="Sample from the top_k most likely tokens (0 = all)")
+    top_p: Optional[float] = Field(default=None, gt=0.0, le=1.0, description="Nucleus sampling threshold (default: backend's)")
+    seed: Optional[int] = Field(default=None, ge=0, description="Sampling seed; the same input and seed give the same audio")
+    
+    def sampling(self) -> dict:
+        """Keyword arguments for infer/infer_batch/infer_stream"""
+        return dict(temperature=self.temperature, top_k=self.top_k, top_p=self.top_p, seed=self.seed)
+
+class TTSRequest(SamplingParams):
     text: str = Field(..., description="Text to synthesize", max_length=15000)
     voice: str = Field(default="Vĩnh (nam miền Nam)", description="Voice sample name")
+    model: Optional[str] = Field(default=None, description="Model ID 'backbone|codec|device' (default: routed, or the last loaded model)")
+    latency_class: Optional[str] = Field(default=None, pattern="^(realtime|bulk)$", description="realtime or bulk (default: by text length)")
     use_batch: bool = Field(default=True, description="Use batch processing if available")
     speed: float = Field(default=1.0, ge=0.5, le=2.0, description="Speed multiplier (0.5-2.0, 1.0 = normal)")
-    format: str = Field(default="wav", pattern="^(wav|mp3)$", description="Output format: wav or mp3")
+    format: str = Field(default="wav", pattern="^(wav|mp3|ogg|flac)$", description="Output format: wav, mp3, ogg (Opus) or flac")
+    cache: bool = Field(default=False, description="Reuse cached audio of identical text chunks")
 
 class TTSCustomRequest(BaseModel):
     text: str = Field(..., description="Text to synthesize", max_length=10000)
     ref_text: str = Field(..., description="Reference text for custom voice")
     use_batch: bool = Field(default=True, description="Use batch processing if available")
 
+class TTSStreamRequest(SamplingParams):
+    text: str = Field(..., description="Text to synthesize")
+    voice: str = Field(default="Vĩnh (nam miền Nam)", description="Voice sample name")
+    model: Optional[str] = Field(default=None, description="Model ID 'backbone|codec|device' (default: routed, or the last loaded model)")
+    latency_class: str = Field(default="realtime", pattern="^(realtime|bulk)$", description="realtime or bulk")
+    format: str = Field(default="wav", pattern="^(wav|pcm)$", description="Output format: wav (streaming header) or pcm (raw 16-bit mono)")
+
 class ModelLoadRequest(BaseModel):
     backbone: str = Field(default="VieNeu-TTS (GPU)", description="Backbone model name")
     codec: str = Field(default="NeuCodec (Standard)", description="Codec model name")
@@ -91,6 +266,12 @@ class StatusResponse(BaseModel):
     device: Optional[str]
     using_lmdeploy: bool
     available_voices: List[str]
+    active_requests: int = 0
+    scheduler: Optional[dict] = None
+    audio_cache: Optional[dict] = None
+    default_model: Optional[str] = None
+    models: Optional[dict] = None
+    router: Optional[dict] = None
 
 @lru_cache(maxsize=32)
 def get_ref_text_cached(text_path: str) -> str:
@@ -105,85 +286,218 @@ def cleanup_gpu_memory():
         torch.cuda.synchronize()
     gc.collect()
 
-def ensure_model_loaded():
-    """Auto-load model with default config if not loaded"""
-    global tts, current_config
+def resolve_target(model: Optional[str], text_chars: int, latency_class: Optional[str] = None) -> SynthesisTarget:
+    """
+    Where a request runs, loading its model if needed.
     
-    if current_config["loaded"] and tts is not None:
-        return  # Model already loaded
+    A request that names a model runs on it through the shared scheduler.
+    Otherwise the router, when engines are configured, picks an engine by
+    text length, latency class and queue depth; without one, the default
+    model is used. Realtime chunks are scheduled before bulk ones.
+    """
+    if model is None and router is not None:
+        engine, latency_class = router.route(text_chars, latency_class)
+        entry = resolve_model(engine.model, allow_lmdeploy=engine.lmdeploy, pin=True, workers=engine.workers)
+        return SynthesisTarget(entry, engine.scheduler, LATENCY_PRIORITY[latency_class])
     
-    print("\n⚠️ Model chưa được load, đang tự động load với config mặc định...")
+    latency_class = classify_request(text_chars, latency_class, ROUTER_CONFIG.get("short_text_chars", 300))
+    return SynthesisTarget(resolve_model(model), scheduler, LATENCY_PRIORITY[latency_class])
+
+def resolve_model(model: Optional[str] = None, allow_lmdeploy: bool = False, pin: bool = False,
+                  workers: int = 1) -> PooledModel:
+    """
+    The resident model a request runs on, loading it into the pool if needed.
     
-    # Default configuration
-    default_backbone = "VieNeu-TTS (GPU)"
-    default_codec = "NeuCodec (Standard)"
-    default_device = "Auto"
+    model is a model ID 'backbone|codec|device' (see /models); None means the
+    default model. Switching between resident models costs nothing. Router
+    engines are loaded with pin, so the pool never evicts them, and with
+    their number of worker processes.
+    """
+    if model is None:
+        model = default_model
+    entry = model_pool.get(model)
+    if entry is not None:
+        return entry
     
     try:
-        backbone_config = BACKBONE_CONFIGS[default_backbone]
-        codec_config = CODEC_CONFIGS[default_codec]
-        
-        # CRITICAL FIX: Force standard backend due to LMDeploy compatibility issues
-        use_lmdeploy = False  # should_use_lmdeploy(default_backbone, default_device)
-        
-        if use_lmdeploy:
-            print(f"🚀 Using LMDeploy backend")
-            backbone_device = "cuda"
-            codec_device = "cpu" if "ONNX" in default_codec else "cuda"
-            
-            tts = FastVieNeuTTS(
-                backbone_repo=backbone_config["repo"],
-                backbone_device=backbone_device,
-                codec_repo=codec_config["repo"],
-                codec_device=codec_device,
-                memory_util=0.3,
-                tp=1,
-                enable_prefix_caching=True,
-                enable_triton=True,
-                max_batch_size=8,
-            )
-            
-            # Pre-cache voice references
-            print("📝 Pre-caching voice references...")
-            for voice_name, voice_info in VOICE_SAMPLES.items():
-                audio_path = voice_info["audio"]
-                text_path = voice_info["text"]
-                if os.path.exists(audio_path) and os.path.exists(text_path):
-                    ref_text = get_ref_text_cached(text_path)
-                    tts.get_cached_reference(voice_name, audio_path, ref_text)
-            
-            current_config["using_lmdeploy"] = True
-        else:
-            print(f"📦 Using standard PyTorch backend (LMDeploy disabled due to compatibility)")
-            
-            if default_device == "Auto":
-                backbone_device = "cuda" if torch.cuda.is_available() else "cpu"
-                codec_device = "cpu" if "ONNX" in default_codec else backbone_device
-            else:
-                backbone_device = default_device.lower()
-                codec_device = "cpu" if "ONNX" in default_codec else backbone_device
-            
-            tts = VieNeuTTS(
-                backbone_repo=backbone_config["repo"],
-                backbone_device=backbone_device,
-                codec_repo=codec_config["repo"],
-                codec_device=codec_device
-            )
-            current_config["using_lmdeploy"] = False
-        
-        current_config.update({
-            "backbone": default_backbone,
-            "codec": default_codec,
-            "device": default_device,
-            "loaded": True
-        })
-        
-        print(f"✅ Model đã được load tự động: {default_backbone} + {default_codec} (Standard Backend)")
-        
+        backbone, codec, device = parse_model_id(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if backbone not in BACKBONE_CONFIGS:
+        raise HTTPException(status_code=400, detail=f"Invalid backbone: {backbone}")
+    if codec not in CODEC_CONFIGS:
+        raise HTTPException(status_code=400, detail=f"Invalid codec: {codec}")
+    
+    print(f"\n⚠️ Model {model} chưa được load, đang tự động load...")
+    try:
+        # LMDeploy only when configured (router engines): compatibility issues with the default setup
+        entry = model_pool.get_or_load(
+            model, lambda: create_tts(backbone, codec, device, allow_lmdeploy=allow_lmdeploy, workers=workers),
+            pin=pin
+        )
     except Exception as e:
         print(f"❌ Lỗi khi auto-load model: {str(e)}")
-        current_config["loaded"] = False
         raise HTTPException(status_code=500, detail=f"Failed to auto-load model: {str(e)}")
+    if model == default_model:
+        set_default_model(entry)
+    return entry
+
+def set_default_model(entry: PooledModel):
+    """Make entry the model for requests that do not name one"""
+    global default_model
+    default_model = entry.model_id
+    current_config.update({
+        "backbone": entry.backbone,
+        "codec": entry.codec,
+        "device": entry.device,
+        "loaded": True,
+        "using_lmdeploy": entry.using_lmdeploy
+    })
+
+def create_tts(backbone: str, codec: str, device: str, allow_lmdeploy: bool = True, enable_triton: bool = True,
+               max_batch_size: int = None, workers: int = 1):
+    """Load a backbone + codec combination; returns (tts, using_lmdeploy)"""
+    backbone_config = BACKBONE_CONFIGS[backbone]
+    codec_config = CODEC_CONFIGS[codec]
+    
+    if workers > 1:
+        if "gguf" not in backbone.lower() or device != "CPU":
+            raise ValueError(f"Worker processes need a GGUF backbone on CPU, got {backbone} on {device}")
+        print(f"🧵 Using GGUF worker pool backend ({workers} processes)")
+        tts = GGUFWorkerPool(
+            backbone_repo=backbone_config["repo"],
+            codec_repo=codec_config["repo"],
+            n_workers=workers,
+        )
+        return tts, False
+    
+    use_lmdeploy = allow_lmdeploy and should_use_lmdeploy(backbone, device)
+    
+    if use_lmdeploy:
+        print(f"🚀 Using LMDeploy backend")
+        backbone_device = "cuda"
+        codec_device = "cpu" if "ONNX" in codec else "cuda"
+        
+        tts = FastVieNeuTTS(
+            backbone_repo=backbone_config["repo"],
+            backbone_device=backbone_device,
+            codec_repo=codec_config["repo"],
+            codec_device=codec_device,
+            memory_util=0.3,
+            tp=1,
+            enable_prefix_caching=True,
+            enable_triton=enable_triton,
+            max_batch_size=max_batch_size or 8,
+        )
+        
+        # Pre-cache voice references
+        print("📝 Pre-caching voice references...")
+        for voice_name, voice_info in VOICE_SAMPLES.items():
+            audio_path = voice_info["audio"]
+            text_path = voice_info["text"]
+            if os.path.exists(audio_path) and os.path.exists(text_path):
+                ref_text = get_ref_text_cached(text_path)
+                tts.get_cached_reference(voice_name, audio_path, ref_text)
+        return tts, True
+    
+    print(f"📦 Using standard backend")
+    
+    if device == "Auto":
+        if "gguf" in backbone.lower():
+            backbone_device = "gpu" if torch.cuda.is_available() else "cpu"
+        else:
+            backbone_device = "cuda" if torch.cuda.is_available() else "cpu"
+        codec_device = "cpu" if "ONNX" in codec else backbone_device
+    else:
+        backbone_device = device.lower()
+        codec_device = "cpu" if "ONNX" in codec else backbone_device
+    
+    if "gguf" in backbone.lower() and backbone_device == "cuda":
+        backbone_device = "gpu"
+    
+    kwargs = {"max_batch_size": max_batch_size} if max_batch_size else {}
+    tts = VieNeuTTS(
+        backbone_repo=backbone_config["repo"],
+        backbone_device=backbone_device,
+        codec_repo=codec_config["repo"],
+        codec_device=codec_device,
+        **kwargs
+    )
+    return tts, False
+
+def load_preset_reference(voice: str, model: PooledModel):
+    """Reference codes (numpy) and text of a preset voice for a model; may run its codec encoder"""
+    voice_info = VOICE_SAMPLES[voice]
+    ref_audio_path = voice_info["audio"]
+    text_path = voice_info["text"]
+    ref_codes_path = voice_info["codes"]
+    
+    ref_text_raw = get_ref_text_cached(text_path)
+    
+    # Encode reference
+    codec_config = CODEC_CONFIGS[model.codec]
+    if codec_config['use_preencoded'] and os.path.exists(ref_codes_path):
+        ref_codes = torch.load(ref_codes_path, map_location="cpu", weights_only=True)
+    else:
+        if model.using_lmdeploy and hasattr(model.tts, 'get_cached_reference'):
+            ref_codes = model.tts.get_cached_reference(voice, ref_audio_path, ref_text_raw)
+        else:
+            ref_codes = model.tts.encode_reference(ref_audio_path)
+    
+    if isinstance(ref_codes, torch.Tensor):
+        ref_codes = ref_codes.cpu().numpy()
+    return ref_codes, ref_text_raw
+
+def encode_uploaded_reference(content: bytes, model: PooledModel):
+    """Encode uploaded reference audio bytes to codes (numpy) with a model's codec"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_audio:
+        tmp_audio.write(content)
+        ref_audio_path = tmp_audio.name
+    try:
+        ref_codes = model.tts.encode_reference(ref_audio_path)
+    finally:
+        os.unlink(ref_audio_path)
+    if isinstance(ref_codes, torch.Tensor):
+        ref_codes = ref_codes.cpu().numpy()
+    return ref_codes
+
+def change_speed(wav: np.ndarray, speed: float) -> np.ndarray:
+    """Time-stretch audio by a speed multiplier"""
+    import librosa
+    print(f"⚡ Applying speed adjustment: {speed}x")
+    return librosa.effects.time_stretch(wav, rate=speed)
+
+def encode_audio_base64(wav: np.ndarray, sr: int, audio_format: str = "wav") -> str:
+    """Encode audio as a base64 string of a file in audio_format"""
+    return base64.b64encode(encode_audio(wav, sr, audio_format)).decode('utf-8')
+
+def audio_response(audio_bytes: bytes, audio_format: str, filename_prefix: str) -> Response:
+    """Encoded audio as a downloadable response"""
+    filename = f"{filename_prefix}_{int(time.time())}.{audio_format}"
+    return Response(
+        content=audio_bytes,
+        media_type=audio_media_type(audio_format),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def wav_stream_header(sr: int) -> bytes:
+    """WAV header for 16-bit mono PCM of unknown length, for streaming"""
+    unknown_size = 0xFFFFFFFF
+    return (
+        b"RIFF" + struct.pack("<I", unknown_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sr, sr * 2, 2, 16)
+        + b"data" + struct.pack("<I", unknown_size)
+    )
+
+def to_pcm16(wav: np.ndarray) -> bytes:
+    """Convert float audio in [-1, 1] to 16-bit little-endian PCM bytes"""
+    return (np.clip(wav, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def release_memory(model: PooledModel):
+    """Free backend and GPU memory after a request"""
+    if model.using_lmdeploy and hasattr(model.tts, 'cleanup_memory'):
+        model.tts.cleanup_memory()
+    cleanup_gpu_memory()
 
 def should_use_lmdeploy(backbone_choice: str, device_choice: str) -> bool:
     """Determine if we should use LMDeploy backend"""
@@ -211,17 +525,28 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/health", response_model=dict)
+async def health():
+    """Liveness probe; answers even while every worker is busy"""
+    return {"status": "ok"}
+
 @app.get("/status", response_model=StatusResponse)
 async def get_status():
     """Get server status and model information"""
     return StatusResponse(
         status="running",
-        model_loaded=current_config["loaded"],
+        model_loaded=any(entry.model_id == default_model for entry in model_pool.models()),
         backbone=current_config["backbone"],
         codec=current_config["codec"],
         device=current_config["device"],
         using_lmdeploy=current_config["using_lmdeploy"],
-        available_voices=list(VOICE_SAMPLES.keys())
+        available_voices=list(VOICE_SAMPLES.keys()),
+        active_requests=active_requests,
+        scheduler=scheduler.stats(),
+        audio_cache=audio_cache.stats(),
+        default_model=default_model,
+        models=model_pool.stats(),
+        router=router.stats() if router is not None else None
     )
 
 @app.get("/voices", response_model=dict)
@@ -235,103 +560,61 @@ async def list_voices():
         }
     return {"voices": voices}
 
+@app.get("/models", response_model=dict)
+async def list_models():
+    """Resident models (least recently used first), the default model and the pool limits"""
+    return {"default_model": default_model, **model_pool.stats()}
+
 @app.post("/load_model", response_model=dict)
 async def load_model(request: ModelLoadRequest):
-    """Load TTS model with specified configuration"""
-    global tts, current_config
+    """
+    Load a model into the pool (if not resident yet) and make it the default.
+    
+    Other resident models stay loaded; the least recently used one is evicted
+    when the pool is full.
+    """
+    return await run_model_load(_load_model, request)
+
+def _load_model(request: ModelLoadRequest) -> dict:
+    if request.backbone not in BACKBONE_CONFIGS:
+        raise HTTPException(status_code=400, detail=f"Invalid backbone: {request.backbone}")
+    if request.codec not in CODEC_CONFIGS:
+        raise HTTPException(status_code=400, detail=f"Invalid codec: {request.codec}")
     
+    model = model_id(request.backbone, request.codec, request.device)
     try:
-        # Cleanup before loading new model
-        if current_config["loaded"] and tts is not None:
-            del tts
-            cleanup_gpu_memory()
-        
-        if request.backbone not in BACKBONE_CONFIGS:
-            raise HTTPException(status_code=400, detail=f"Invalid backbone: {request.backbone}")
-        if request.codec not in CODEC_CONFIGS:
-            raise HTTPException(status_code=400, detail=f"Invalid codec: {request.codec}")
-        
-        backbone_config = BACKBONE_CONFIGS[request.backbone]
-        codec_config = CODEC_CONFIGS[request.codec]
-        
-        use_lmdeploy = should_use_lmdeploy(request.backbone, request.device)
-        
-        if use_lmdeploy:
-            print(f"🚀 Using LMDeploy backend")
-            backbone_device = "cuda"
-            codec_device = "cpu" if "ONNX" in request.codec else "cuda"
-            
-            tts = FastVieNeuTTS(
-                backbone_repo=backbone_config["repo"],
-                backbone_device=backbone_device,
-                codec_repo=codec_config["repo"],
-                codec_device=codec_device,
-                memory_util=0.3,
-                tp=1,
-                enable_prefix_caching=True,
-                enable_triton=request.enable_triton,
-                max_batch_size=request.max_batch_size,
-            )
-            
-            # Pre-cache voice references
-            print("📝 Pre-caching voice references...")
-            for voice_name, voice_info in VOICE_SAMPLES.items():
-                audio_path = voice_info["audio"]
-                text_path = voice_info["text"]
-                if os.path.exists(audio_path) and os.path.exists(text_path):
-                    ref_text = get_ref_text_cached(text_path)
-                    tts.get_cached_reference(voice_name, audio_path, ref_text)
-            
-            current_config["using_lmdeploy"] = True
-        else:
-            print(f"📦 Using standard backend")
-            
-            if request.device == "Auto":
-                if "gguf" in request.backbone.lower():
-                    backbone_device = "gpu" if torch.cuda.is_available() else "cpu"
-                else:
-                    backbone_device = "cuda" if torch.cuda.is_available() else "cpu"
-                codec_device = "cpu" if "ONNX" in request.codec else backbone_device
-            else:
-                backbone_device = request.device.lower()
-                codec_device = "cpu" if "ONNX" in request.codec else backbone_device
-            
-            if "gguf" in request.backbone.lower() and backbone_device == "cuda":
-                backbone_device = "gpu"
-            
-            tts = VieNeuTTS(
-                backbone_repo=backbone_config["repo"],
-                backbone_device=backbone_device,
-                codec_repo=codec_config["repo"],
-                codec_device=codec_device
-            )
-            current_config["using_lmdeploy"] = False
-        
-        current_config.update({
-            "backbone": request.backbone,
-            "codec": request.codec,
-            "device": request.device,
-            "loaded": True
-        })
-        
-        return {
-            "status": "success",
-            "message": "Model loaded successfully",
-            "backend": "LMDeploy" if use_lmdeploy else "Standard",
-            "config": current_config
-        }
-        
+        entry = model_pool.get_or_load(model, lambda: create_tts(
+            request.backbone,
+            request.codec,
+            request.device,
+            enable_triton=request.enable_triton,
+            max_batch_size=request.max_batch_size
+        ))
     except Exception as e:
-        current_config["loaded"] = False
         raise HTTPException(status_code=500, detail=f"Failed to load model: {str(e)}")
+    
+    # Takes effect for a model that was already resident, too
+    entry.tts.max_batch_size = request.max_batch_size
+    set_default_model(entry)
+    
+    return {
+        "status": "success",
+        "message": "Model loaded successfully",
+        "model": model,
+        "backend": "LMDeploy" if entry.using_lmdeploy else "Standard",
+        "config": current_config,
+        "resident_models": [resident.model_id for resident in model_pool.models()]
+    }
 
-@app.post("/synthesize", response_class=FileResponse)
+@app.post("/synthesize", response_class=Response)
 async def synthesize(request: TTSRequest):
     """Synthesize speech from text using preset voice"""
-    global tts, current_config
-    
-    # Auto-load model if not loaded
-    ensure_model_loaded()
+    async with admit_request():
+        return await _synthesize(request)
+
+async def _synthesize(request: TTSRequest):
+    # The requested or routed model, loaded if needed
+    target = await run_model_load(resolve_target, request.model, len(request.text), request.latency_class)
     
     if not request.text or request.text.strip() == "":
         raise HTTPException(status_code=400, detail="Text is required")
@@ -341,25 +624,7 @@ async def synthesize(request: TTSRequest):
     
     try:
         # Get reference
-        voice_info = VOICE_SAMPLES[request.voice]
-        ref_audio_path = voice_info["audio"]
-        text_path = voice_info["text"]
-        ref_codes_path = voice_info["codes"]
-        
-        ref_text_raw = get_ref_text_cached(text_path)
-        
-        # Encode reference
-        codec_config = CODEC_CONFIGS[current_config["codec"]]
-        if codec_config['use_preencoded'] and os.path.exists(ref_codes_path):
-            ref_codes = torch.load(ref_codes_path, map_location="cpu", weights_only=True)
-        else:
-            if current_config["using_lmdeploy"] and hasattr(tts, 'get_cached_reference'):
-                ref_codes = tts.get_cached_reference(request.voice, ref_audio_path, ref_text_raw)
-            else:
-                ref_codes = tts.encode_reference(ref_audio_path)
-        
-        if isinstance(ref_codes, torch.Tensor):
-            ref_codes = ref_codes.cpu().numpy()
+        ref_codes, ref_text_raw = await run_blocking(load_preset_reference, request.voice, target.model)
         
         # Split text into chunks
         text_chunks = split_text_into_chunks(request.text.strip(), max_chars=MAX_CHARS_PER_CHUNK)
@@ -377,21 +642,15 @@ async def synthesize(request: TTSRequest):
         sr = 24000
         silence_pad = np.zeros(int(sr * 0.15), dtype=np.float32)
         
-        # Use batch processing if enabled and available
-        if request.use_batch and current_config["using_lmdeploy"] and hasattr(tts, 'infer_batch') and len(text_chunks) > 1:
-            chunk_wavs = tts.infer_batch(text_chunks, ref_codes, ref_text_raw)
-            for i, chunk_wav in enumerate(chunk_wavs):
-                if chunk_wav is not None and len(chunk_wav) > 0:
-                    all_audio_segments.append(chunk_wav)
-                    if i < len(text_chunks) - 1:
-                        all_audio_segments.append(silence_pad)
-        else:
-            for i, chunk in enumerate(text_chunks):
-                chunk_wav = tts.infer(chunk, ref_codes, ref_text_raw)
-                if chunk_wav is not None and len(chunk_wav) > 0:
-                    all_audio_segments.append(chunk_wav)
-                    if i < len(text_chunks) - 1:
-                        all_audio_segments.append(silence_pad)
+        # Chunks are batched with those of other in-flight requests when use_batch is set
+        chunk_wavs = await synthesize_chunks(
+            target, text_chunks, ref_codes, ref_text_raw, request.use_batch, request.sampling(), request.cache
+        )
+        for i, chunk_wav in enumerate(chunk_wavs):
+            if chunk_wav is not None and len(chunk_wav) > 0:
+                all_audio_segments.append(chunk_wav)
+                if i < len(text_chunks) - 1:
+                    all_audio_segments.append(silence_pad)
         
         if not all_audio_segments:
             raise HTTPException(status_code=500, detail="Failed to generate audio")
@@ -401,54 +660,21 @@ async def synthesize(request: TTSRequest):
         
         # Apply speed adjustment if needed
         if request.speed != 1.0:
-            import librosa
-            print(f"⚡ Applying speed adjustment: {request.speed}x")
-            final_wav = librosa.effects.time_stretch(final_wav, rate=request.speed)
-        
-        # Create temporary file
-        if request.format == "mp3":
-            # Save as WAV first, then convert to MP3
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_wav:
-                sf.write(tmp_wav.name, final_wav, sr)
-                
-                # Convert to MP3 using pydub
-                from pydub import AudioSegment
-                print(f"🎵 Converting to MP3...")
-                audio = AudioSegment.from_wav(tmp_wav.name)
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_mp3:
-                    audio.export(tmp_mp3.name, format="mp3", bitrate="128k")
-                    output_path = tmp_mp3.name
-                
-                # Clean up temp WAV
-                os.unlink(tmp_wav.name)
-        else:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                sf.write(tmp.name, final_wav, sr)
-                output_path = tmp.name
+            final_wav = await run_blocking(change_speed, final_wav, request.speed)
+        
+        # Encode in memory
+        audio_bytes = await run_blocking(encode_audio, final_wav, sr, request.format)
         
         # Cleanup memory
-        if current_config["using_lmdeploy"] and hasattr(tts, 'cleanup_memory'):
-            tts.cleanup_memory()
-        cleanup_gpu_memory()
-        
-        # Determine media type and filename based on format
-        if request.format == "mp3":
-            media_type = "audio/mpeg"
-            filename = f"tts_output_{int(time.time())}.mp3"
-        else:
-            media_type = "audio/wav"
-            filename = f"tts_output_{int(time.time())}.wav"
-        
-        return FileResponse(
-            output_path,
-            media_type=media_type,
-            filename=filename,
-            background=None
-        )
+        await run_blocking(release_memory, target.model)
+        
+        return audio_response(audio_bytes, request.format, "tts_output")
         
+    except HTTPException:
+        # 503 from a full queue, or an explicit error above
+        raise
     except Exception as e:
-        cleanup_gpu_memory()
+        await run_blocking(cleanup_gpu_memory)
         import traceback
         error_trace = traceback.format_exc()
         print(f"\n❌ ERROR in /synthesize:")
@@ -457,33 +683,264 @@ async def synthesize(request: TTSRequest):
         print(f"Full traceback:\n{error_trace}")
         raise HTTPException(status_code=500, detail=f"Synthesis failed: {str(e)}")
 
+@app.post("/synthesize_stream")
+async def synthesize_stream(request: TTSStreamRequest):
+    """
+    Stream speech as it is generated: raw 16-bit PCM, or WAV with a streaming header.
+    
+    Each text chunk is synthesized with infer_stream and joined to the previous
+    one with a short crossfade. Headers are sent with the first audio, and
+    X-Time-To-First-Byte-Ms reports how long that took.
+    """
+    start_time = time.perf_counter()
+    acquire_request_slot()
+    try:
+        target = await run_model_load(resolve_target, request.model, len(request.text or ""), request.latency_class)
+        
+        text = request.text.strip() if request.text else ""
+        if not text:
+            raise HTTPException(status_code=400, detail="Text is required")
+        if len(text) > MAX_TOTAL_CHARS_STREAMING:
+            raise HTTPException(status_code=400, detail=f"Text is longer than {MAX_TOTAL_CHARS_STREAMING} characters")
+        if request.voice not in VOICE_SAMPLES:
+            raise HTTPException(status_code=400, detail=f"Invalid voice: {request.voice}")
+        
+        ref_codes, ref_text_raw = await run_blocking(load_preset_reference, request.voice, target.model)
+        text_chunks = split_text_into_chunks(text, max_chars=MAX_CHARS_PER_CHUNK)
+        
+        # Wait for the first audio, so its latency can go into the headers
+        parts = target.scheduler.stream(
+            text_chunks, ref_codes, ref_text_raw, request.sampling(), target.model.tts, target.priority
+        )
+        first_parts = []
+        try:
+            async for index, audio in parts:
+                first_parts.append((index, audio))
+                if audio is not None and len(audio) > 0:
+                    break
+        except SchedulerFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+        ttfb_ms = (time.perf_counter() - start_time) * 1000
+        print(f"⚡ /synthesize_stream first audio after {ttfb_ms:.0f} ms ({len(text_chunks)} chunks)")
+    except HTTPException:
+        release_request_slot()
+        raise
+    except Exception as e:
+        release_request_slot()
+        print(f"\n❌ ERROR in /synthesize_stream: {type(e).__name__}: {e}")
+        raise HTTPException(status_code=500, detail=f"Synthesis failed: {str(e)}")
+    
+    sr = 24000
+    
+    async def audio_stream():
+        crossfader = StreamCrossfader(int(sr * 0.03))
+        try:
+            if request.format == "wav":
+                yield wav_stream_header(sr)
+            for index, audio in first_parts:
+                if audio is None:
+                    crossfader.start_segment()
+                elif len(audio) > 0:
+                    yield to_pcm16(crossfader.add(audio))
+            async for index, audio in parts:
+                if audio is None:
+                    crossfader.start_segment()
+                    continue
+                ready = crossfader.add(audio)
+                if len(ready) > 0:
+                    yield to_pcm16(ready)
+            yield to_pcm16(crossfader.flush())
+        except Exception as e:
+            # Headers are already sent: the stream just ends early
+            print(f"\n❌ ERROR in /synthesize_stream while streaming: {type(e).__name__}: {e}")
+        finally:
+            await parts.aclose()
+            release_request_slot()
+    
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/wav" if request.format == "wav" else "audio/L16; rate=24000; channels=1",
+        headers={
+            "X-Time-To-First-Byte-Ms": f"{ttfb_ms:.1f}",
+            "X-Sample-Rate": str(sr),
+            "Cache-Control": "no-cache",
+        }
+    )
+
+@app.websocket("/ws/synthesize")
+async def synthesize_websocket(websocket: WebSocket):
+    """
+    Duplex streaming: text fragments in, 16-bit PCM frames out.
+    
+    Client messages are JSON: {"type": "config", "voice": ...} picks the voice
+    (and may set "model" and the SamplingParams fields), {"type": "text", "text": ...} adds text, {"type": "flush"} synthesizes what
+    is left and ends the utterance with {"type": "done"}, and {"type": "cancel"}
+    drops all pending text and audio. Each sentence is synthesized as soon as
+    it is complete, while more text is still arriving.
+    """
+    await websocket.accept()
+    try:
+        acquire_request_slot()
+    except HTTPException as e:
+        await websocket.close(code=1013, reason=e.detail)
+        return
+    
+    sr = 24000
+    voice = "Vĩnh (nam miền Nam)"
+    # Model ID from the client's config; None = routed, or the default model
+    model = None
+    sampling = SamplingParams()
+    chunker = IncrementalTextChunker(max_chars=MAX_CHARS_PER_CHUNK)
+    pending = asyncio.Queue()
+    references = {}
+    
+    async def send_error(detail: str):
+        await websocket.send_text(json.dumps({"type": "error", "detail": detail}))
+    
+    async def synthesis_worker():
+        crossfader = StreamCrossfader(int(sr * 0.03))
+        while True:
+            item = await pending.get()
+            if item is None:
+                # Flush marker: the utterance is complete
+                tail = crossfader.flush()
+                if len(tail) > 0:
+                    await websocket.send_bytes(to_pcm16(tail))
+                await websocket.send_text(json.dumps({"type": "done"}))
+                continue
+            chunk, chunk_voice, chunk_sampling, chunk_model = item
+            try:
+                target = await run_model_load(resolve_target, chunk_model, len(chunk), "realtime")
+                # Reference codes depend on the model's codec
+                reference_key = (target.model.model_id, chunk_voice)
+                if reference_key not in references:
+                    references[reference_key] = await run_blocking(load_preset_reference, chunk_voice, target.model)
+                ref_codes, ref_text_raw = references[reference_key]
+                crossfader.start_segment()
+                parts = target.scheduler.stream(
+                    [chunk], ref_codes, ref_text_raw, chunk_sampling, target.model.tts, target.priority
+                )
+                try:
+                    async for _, audio in parts:
+                        if audio is None:
+                            continue
+                        ready = crossfader.add(audio)
+                        if len(ready) > 0:
+                            await websocket.send_bytes(to_pcm16(ready))
+                finally:
+                    # Stops the chunk at once when the worker is cancelled
+                    await parts.aclose()
+            except SchedulerFullError as e:
+                await send_error(f"Server busy, chunk dropped: {e}")
+            except Exception as e:
+                print(f"\n❌ ERROR in /ws/synthesize: {type(e).__name__}: {e}")
+                await send_error(f"Synthesis failed: {str(e)}")
+    
+    worker = None
+    try:
+        if router is None:
+            await run_model_load(resolve_model)
+        worker = asyncio.create_task(synthesis_worker())
+        await websocket.send_text(json.dumps({"type": "ready", "sample_rate": sr, "format": "pcm_s16le"}))
+        
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await send_error("Messages must be JSON")
+                continue
+            if not isinstance(message, dict):
+                await send_error("Messages must be JSON objects")
+                continue
+            message_type = message.get("type", "text")
+            
+            if message_type == "config":
+                new_voice = message.get("voice", voice)
+                if new_voice not in VOICE_SAMPLES:
+                    await send_error(f"Invalid voice: {new_voice}")
+                    continue
+                try:
+                    settings = {name: message[name] for name in SamplingParams.model_fields if name in message}
+                    sampling = SamplingParams(**{**sampling.model_dump(), **settings})
+                except ValidationError as e:
+                    await send_error(f"Invalid sampling settings: {e.errors()[0]['msg']}")
+                    continue
+                if message.get("model") is not None:
+                    try:
+                        await run_model_load(resolve_model, message["model"])
+                    except HTTPException as e:
+                        await send_error(e.detail)
+                        continue
+                model = message.get("model", model)
+                voice = new_voice
+            elif message_type == "text":
+                text = message.get("text") or ""
+                if len(text) > MAX_TOTAL_CHARS_STREAMING:
+                    await send_error(f"Text is longer than {MAX_TOTAL_CHARS_STREAMING} characters")
+                    continue
+                for chunk in chunker.feed(text):
+                    pending.put_nowait((chunk, voice, sampling.sampling(), model))
+            elif message_type == "flush":
+                for chunk in chunker.flush():
+                    pending.put_nowait((chunk, voice, sampling.sampling(), model))
+                pending.put_nowait(None)
+            elif message_type == "cancel":
+                chunker.clear()
+                while not pending.empty():
+                    pending.get_nowait()
+                # Cancelling the worker stops the chunk being synthesized (see BatchScheduler.stream)
+                worker.cancel()
+                await asyncio.gather(worker, return_exceptions=True)
+                worker = asyncio.create_task(synthesis_worker())
+                await websocket.send_text(json.dumps({"type": "cancelled"}))
+            else:
+                await send_error(f"Unknown message type: {message_type}")
+    except WebSocketDisconnect:
+        pass
+    except HTTPException as e:
+        await send_error(e.detail)
+        await websocket.close(code=1011)
+    finally:
+        if worker is not None:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        release_request_slot()
+
 @app.post("/synthesize_custom")
 async def synthesize_custom(
     text: str = Form(...),
     ref_text: str = Form(...),
     ref_audio: UploadFile = File(...),
-    use_batch: bool = Form(True)
+    use_batch: bool = Form(True),
+    cache: bool = Form(False),
+    temperature: float = Form(1.0, gt=0.0, le=2.0),
+    top_k: int = Form(50, ge=0),
+    top_p: Optional[float] = Form(None, gt=0.0, le=1.0),
+    seed: Optional[int] = Form(None, ge=0),
+    format: str = Form("wav", pattern="^(wav|mp3|ogg|flac)$"),
+    model: Optional[str] = Form(None),
+    latency_class: Optional[str] = Form(None, pattern="^(realtime|bulk)$")
 ):
     """Synthesize speech with custom reference audio"""
-    global tts, current_config
-    
-    # Auto-load model if not loaded
-    ensure_model_loaded()
+    sampling = dict(temperature=temperature, top_k=top_k, top_p=top_p, seed=seed)
+    async with admit_request():
+        return await _synthesize_custom(
+            text, ref_text, ref_audio, use_batch, sampling, cache, format, model, latency_class
+        )
+
+async def _synthesize_custom(text: str, ref_text: str, ref_audio: UploadFile, use_batch: bool, sampling: dict,
+                             use_cache: bool, audio_format: str, model_name: Optional[str],
+                             latency_class: Optional[str]):
+    # The requested or routed model, loaded if needed
+    target = await run_model_load(resolve_target, model_name, len(text), latency_class)
     
     if not text or text.strip() == "":
         raise HTTPException(status_code=400, detail="Text is required")
     
     try:
-        # Save uploaded audio to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_audio:
-            content = await ref_audio.read()
-            tmp_audio.write(content)
-            ref_audio_path = tmp_audio.name
-        
-        # Encode reference
-        ref_codes = tts.encode_reference(ref_audio_path)
-        if isinstance(ref_codes, torch.Tensor):
-            ref_codes = ref_codes.cpu().numpy()
+        # Encode uploaded reference audio
+        content = await ref_audio.read()
+        ref_codes = await run_blocking(encode_uploaded_reference, content, target.model)
         
         # Split text into chunks
         text_chunks = split_text_into_chunks(text.strip(), max_chars=MAX_CHARS_PER_CHUNK)
@@ -493,46 +950,31 @@ async def synthesize_custom(
         sr = 24000
         silence_pad = np.zeros(int(sr * 0.15), dtype=np.float32)
         
-        if use_batch and current_config["using_lmdeploy"] and hasattr(tts, 'infer_batch') and len(text_chunks) > 1:
-            chunk_wavs = tts.infer_batch(text_chunks, ref_codes, ref_text)
-            for i, chunk_wav in enumerate(chunk_wavs):
-                if chunk_wav is not None and len(chunk_wav) > 0:
-                    all_audio_segments.append(chunk_wav)
-                    if i < len(text_chunks) - 1:
-                        all_audio_segments.append(silence_pad)
-        else:
-            for i, chunk in enumerate(text_chunks):
-                chunk_wav = tts.infer(chunk, ref_codes, ref_text)
-                if chunk_wav is not None and len(chunk_wav) > 0:
-                    all_audio_segments.append(chunk_wav)
-                    if i < len(text_chunks) - 1:
-                        all_audio_segments.append(silence_pad)
+        # Chunks are batched with those of other in-flight requests when use_batch is set
+        chunk_wavs = await synthesize_chunks(target, text_chunks, ref_codes, ref_text, use_batch, sampling, use_cache)
+        for i, chunk_wav in enumerate(chunk_wavs):
+            if chunk_wav is not None and len(chunk_wav) > 0:
+                all_audio_segments.append(chunk_wav)
+                if i < len(text_chunks) - 1:
+                    all_audio_segments.append(silence_pad)
         
         if not all_audio_segments:
             raise HTTPException(status_code=500, detail="Failed to generate audio")
         
-        # Concatenate and save
+        # Concatenate and encode in memory
         final_wav = np.concatenate(all_audio_segments)
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            sf.write(tmp.name, final_wav, sr)
-            output_path = tmp.name
+        audio_bytes = await run_blocking(encode_audio, final_wav, sr, audio_format)
         
         # Cleanup
-        os.unlink(ref_audio_path)
-        if current_config["using_lmdeploy"] and hasattr(tts, 'cleanup_memory'):
-            tts.cleanup_memory()
-        cleanup_gpu_memory()
-        
-        return FileResponse(
-            output_path,
-            media_type="audio/wav",
-            filename=f"tts_custom_{int(time.time())}.wav",
-            background=None
-        )
+        await run_blocking(release_memory, target.model)
+        
+        return audio_response(audio_bytes, audio_format, "tts_custom")
         
+    except HTTPException:
+        # 503 from a full queue, or an explicit error above
+        raise
     except Exception as e:
-        cleanup_gpu_memory()
+        await run_blocking(cleanup_gpu_memory)
         import traceback
         error_trace = traceback.format_exc()
         print(f"\n❌ ERROR in /synthesize_custom:")
@@ -544,10 +986,12 @@ async def synthesize_custom(
 @app.post("/synthesize_base64", response_model=dict)
 async def synthesize_base64(request: TTSRequest):
     """Synthesize speech and return as base64 encoded audio"""
-    global tts, current_config
-    
-    # Auto-load model if not loaded
-    ensure_model_loaded()
+    async with admit_request():
+        return await _synthesize_base64(request)
+
+async def _synthesize_base64(request: TTSRequest):
+    # The requested or routed model, loaded if needed
+    target = await run_model_load(resolve_target, request.model, len(request.text), request.latency_class)
     
     if not request.text or request.text.strip() == "":
         raise HTTPException(status_code=400, detail="Text is required")
@@ -557,25 +1001,7 @@ async def synthesize_base64(request: TTSRequest):
     
     try:
         # Get reference
-        voice_info = VOICE_SAMPLES[request.voice]
-        ref_audio_path = voice_info["audio"]
-        text_path = voice_info["text"]
-        ref_codes_path = voice_info["codes"]
-        
-        ref_text_raw = get_ref_text_cached(text_path)
-        
-        # Encode reference
-        codec_config = CODEC_CONFIGS[current_config["codec"]]
-        if codec_config['use_preencoded'] and os.path.exists(ref_codes_path):
-            ref_codes = torch.load(ref_codes_path, map_location="cpu", weights_only=True)
-        else:
-            if current_config["using_lmdeploy"] and hasattr(tts, 'get_cached_reference'):
-                ref_codes = tts.get_cached_reference(request.voice, ref_audio_path, ref_text_raw)
-            else:
-                ref_codes = tts.encode_reference(ref_audio_path)
-        
-        if isinstance(ref_codes, torch.Tensor):
-            ref_codes = ref_codes.cpu().numpy()
+        ref_codes, ref_text_raw = await run_blocking(load_preset_reference, request.voice, target.model)
         
         # Split text into chunks
         text_chunks = split_text_into_chunks(request.text.strip(), max_chars=MAX_CHARS_PER_CHUNK)
@@ -585,51 +1011,39 @@ async def synthesize_base64(request: TTSRequest):
         sr = 24000
         silence_pad = np.zeros(int(sr * 0.15), dtype=np.float32)
         
-        if request.use_batch and current_config["using_lmdeploy"] and hasattr(tts, 'infer_batch') and len(text_chunks) > 1:
-            chunk_wavs = tts.infer_batch(text_chunks, ref_codes, ref_text_raw)
-            for i, chunk_wav in enumerate(chunk_wavs):
-                if chunk_wav is not None and len(chunk_wav) > 0:
-                    all_audio_segments.append(chunk_wav)
-                    if i < len(text_chunks) - 1:
-                        all_audio_segments.append(silence_pad)
-        else:
-            for i, chunk in enumerate(text_chunks):
-                chunk_wav = tts.infer(chunk, ref_codes, ref_text_raw)
-                if chunk_wav is not None and len(chunk_wav) > 0:
-                    all_audio_segments.append(chunk_wav)
-                    if i < len(text_chunks) - 1:
-                        all_audio_segments.append(silence_pad)
+        # Chunks are batched with those of other in-flight requests when use_batch is set
+        chunk_wavs = await synthesize_chunks(
+            target, text_chunks, ref_codes, ref_text_raw, request.use_batch, request.sampling(), request.cache
+        )
+        for i, chunk_wav in enumerate(chunk_wavs):
+            if chunk_wav is not None and len(chunk_wav) > 0:
+                all_audio_segments.append(chunk_wav)
+                if i < len(text_chunks) - 1:
+                    all_audio_segments.append(silence_pad)
         
         if not all_audio_segments:
             raise HTTPException(status_code=500, detail="Failed to generate audio")
         
-        # Concatenate and save to temp file
+        # Concatenate and encode to base64
         final_wav = np.concatenate(all_audio_segments)
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            sf.write(tmp.name, final_wav, sr)
-            
-            # Read and encode to base64
-            with open(tmp.name, "rb") as f:
-                audio_bytes = f.read()
-                audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-            
-            os.unlink(tmp.name)
+        audio_base64 = await run_blocking(encode_audio_base64, final_wav, sr, request.format)
         
         # Cleanup memory
-        if current_config["using_lmdeploy"] and hasattr(tts, 'cleanup_memory'):
-            tts.cleanup_memory()
-        cleanup_gpu_memory()
+        await run_blocking(release_memory, target.model)
         
         return {
             "status": "success",
             "audio_base64": audio_base64,
+            "format": request.format,
             "sample_rate": sr,
             "duration": len(final_wav) / sr
         }
         
+    except HTTPException:
+        # 503 from a full queue, or an explicit error above
+        raise
     except Exception as e:
-        cleanup_gpu_memory()
+        await run_blocking(cleanup_gpu_memory)
         import traceback
         error_trace = traceback.format_exc()
         print(f"\n❌ ERROR in /synthesize_base64:")
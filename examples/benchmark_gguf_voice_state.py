@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vieneu_tts import VieNeuTTS
+from utils.phonemize_text import phonemize_with_dict
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "sample")
+CHUNKS = [
+    "Hà Nội là thủ đô của nước Cộng hòa Xã hội chủ nghĩa Việt Nam.",
+    "Thành phố có lịch sử hơn một nghìn năm.",
+    "Hồ Gươm nằm ở trung tâm thành phố.",
+    "Phở là món ăn nổi tiếng nhất của người Hà Nội.",
+]
+
+
+def load_voice(name):
+    ref_codes = torch.load(os.path.join(SAMPLE_DIR, f"{name}.pt"), map_location="cpu")
+    with open(os.path.join(SAMPLE_DIR, f"{name}.txt"), "r", encoding="utf-8") as f:
+        ref_text = f.read()
+    return ref_codes, ref_text
+
+
+def time_prompt_eval(tts, voice, text):
+    """Seconds until the first token of a completion, i.e. mostly prompt evaluation."""
+    prompt_ids = voice.prompt_ids(phonemize_with_dict(text))
+    start = time.perf_counter()
+    tts._restore_voice_state(voice)
+    tts.backbone(prompt_ids, max_tokens=1, temperature=1.0, top_k=50)
+    return time.perf_counter() - start
+
+
+def run(tts, voices, rounds):
+    """Chunks alternate between voices, so the KV cache never holds the next voice's prefix."""
+    times = []
+    for _ in range(rounds):
+        for text in CHUNKS:
+            for voice in voices:
+                times.append(time_prompt_eval(tts, voice, text))
+    return times
+
+
+def main(backbone_repo, voice_names, rounds):
+    tts = VieNeuTTS(backbone_repo=backbone_repo, backbone_device="cpu", codec_repo="neuphonic/neucodec", codec_device="cpu")
+    voices = [tts.prepare_voice(*load_voice(name)) for name in voice_names]
+
+    n_prefix = np.mean([len(voice.prefix_ids) for voice in voices])
+    n_prompt = np.mean([len(voice.prompt_ids(phonemize_with_dict(text))) for voice in voices for text in CHUNKS])
+    print(f"{backbone_repo}: ~{n_prompt:.0f} prompt tokens per chunk, ~{n_prefix:.0f} of them in the voice prefix")
+
+    # Warm-up, also saves the voice states
+    run(tts, voices, 1)
+
+    results = {}
+    for enabled in (False, True):
+        tts._cache_voice_state = enabled
+        results[enabled] = run(tts, voices, rounds)
+
+    for enabled, times in results.items():
+        label = "with voice state   " if enabled else "without voice state"
+        print(f"  {label}: prompt eval {np.median(times) * 1000:.1f} ms (median of {len(times)} chunks)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GGUF prompt evaluation with and without saved voice KV states")
+    parser.add_argument("--backbone", default="pnnbao-ump/VieNeu-TTS-q4-gguf", help="GGUF backbone repo")
+    parser.add_argument("--voices", nargs="+", default=["Vĩnh (nam miền Nam)", "Ngọc (nữ miền Bắc)"], help="Sample voice names in sample/")
+    parser.add_argument("--rounds", type=int, default=3, help="Times each chunk is timed per voice")
+    args = parser.parse_args()
+    main(args.backbone, args.voices, args.rounds)
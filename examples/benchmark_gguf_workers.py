@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vieneu_tts import GGUFWorkerPool
+from vieneu_tts.worker_pool import available_cores
+from utils.core_utils import split_text_into_chunks
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "sample")
+LONG_TEXT = os.path.join(os.path.dirname(__file__), "sample_long_text.txt")
+
+
+def load_voice(name):
+    ref_codes = torch.load(os.path.join(SAMPLE_DIR, f"{name}.pt"), map_location="cpu")
+    with open(os.path.join(SAMPLE_DIR, f"{name}.txt"), "r", encoding="utf-8") as f:
+        ref_text = f.read()
+    return ref_codes, ref_text
+
+
+def main(backbone_repo, codec_repo, voice_name, worker_counts, max_chars):
+    ref_codes, ref_text = load_voice(voice_name)
+    with open(LONG_TEXT, "r", encoding="utf-8") as f:
+        chunks = split_text_into_chunks(f.read(), max_chars=max_chars)
+    total_chars = sum(len(chunk) for chunk in chunks)
+    print(f"{len(chunks)} chunks, {total_chars} characters, {len(available_cores())} cores")
+
+    baseline = None
+    for n_workers in worker_counts:
+        with GGUFWorkerPool(backbone_repo=backbone_repo, codec_repo=codec_repo, n_workers=n_workers) as pool:
+            # Warm-up: one chunk per worker, also saves each worker's voice state
+            pool.infer_batch(chunks[:n_workers], ref_codes, ref_text)
+
+            start = time.perf_counter()
+            wavs = pool.infer_batch(chunks, ref_codes, ref_text)
+            elapsed = time.perf_counter() - start
+
+        chars_per_second = total_chars / elapsed
+        baseline = baseline or chars_per_second / n_workers
+        audio_seconds = sum(len(wav) for wav in wavs) / pool.sample_rate
+        print(
+            f"  {n_workers:>2} workers: {chars_per_second:7.1f} chars/s, RTF {elapsed / audio_seconds:.3f}, "
+            f"scaling {chars_per_second / baseline:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GGUF CPU throughput against the number of worker processes")
+    parser.add_argument("--backbone", default="pnnbao-ump/VieNeu-TTS-q4-gguf", help="GGUF backbone repo")
+    parser.add_argument("--codec", default="neuphonic/neucodec-onnx-decoder", help="Codec repo")
+    parser.add_argument("--voice", default="Vĩnh (nam miền Nam)", help="Sample voice name in sample/")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to compare")
+    parser.add_argument("--max-chars", type=int, default=256, help="Characters per chunk")
+    args = parser.parse_args()
+    main(args.backbone, args.codec, args.voice, args.workers, args.max_chars)
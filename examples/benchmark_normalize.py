@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.normalize_text import VietnameseTTSNormalizer
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "normalize_golden.jsonl")
+
+
+def load_golden(path=GOLDEN_PATH):
+    """Load (input, expected output) pairs recorded from the reference normalizer."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check_golden(normalizer, cases):
+    """Return the cases whose output differs from the golden corpus."""
+    return [case for case in cases if normalizer.normalize(case["input"]) != case["output"]]
+
+
+def build_payload(cases, target_chars):
+    """Repeat the golden sentences until the payload reaches target_chars (like a /synthesize request)."""
+    cases = [case for case in cases if case["kind"] == "sentence"]
+    parts = []
+    size = 0
+    while size < target_chars:
+        for case in cases:
+            parts.append(case["input"])
+            size += len(case["input"]) + 1
+            if size >= target_chars:
+                break
+    return " ".join(parts)
+
+
+def main(payload_chars=15000, repeats=20):
+    cases = load_golden()
+
+    start = time.perf_counter()
+    normalizer = VietnameseTTSNormalizer()
+    init_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = check_golden(normalizer, cases)
+    print(f"Golden corpus: {len(cases) - len(mismatches)}/{len(cases)} identical")
+    for case in mismatches[:5]:
+        print(f"  ❌ {case['input']!r}")
+
+    payload = build_payload(cases, payload_chars)
+    normalizer.normalize(payload)  # warm up
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        normalizer.normalize(payload)
+    elapsed = time.perf_counter() - start
+
+    per_call_ms = elapsed / repeats * 1000
+    print(f"Init: {init_ms:.2f} ms")
+    print(f"Payload: {len(payload)} chars x {repeats} runs")
+    print(f"normalize(): {per_call_ms:.2f} ms/call, {len(payload) * repeats / elapsed / 1e6:.2f} M chars/s")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark VietnameseTTSNormalizer against the golden corpus")
+    parser.add_argument("--chars", type=int, default=15000, help="Payload size in characters")
+    parser.add_argument("--repeats", type=int, default=20, help="Number of timed runs")
+    args = parser.parse_args()
+    sys.exit(main(payload_chars=args.chars, repeats=args.repeats))
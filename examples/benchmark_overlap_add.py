@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vieneu_tts.vieneu_tts import _linear_overlap_add, _StreamingOverlapAdd
+
+
+def random_streams(n_streams, seed=0):
+    """Deterministic (frames, final frame or None, stride) streams shaped like infer_stream's chunks."""
+    rng = np.random.default_rng(seed)
+    streams = []
+    while len(streams) < n_streams:
+        hop = int(rng.choice([480, 7, 13]))
+        frames_per_chunk = int(rng.choice([50, 25, 3, 10]))
+        overlap_frames = int(rng.choice([1, 2]))
+        stride = frames_per_chunk * hop
+        frame_length = (frames_per_chunk + 2 * overlap_frames) * hop
+        dtype = rng.choice([np.float32, np.float64])
+        frames = [rng.standard_normal(frame_length).astype(dtype) for _ in range(rng.integers(0, 12))]
+        final = None
+        if rng.random() >= 0.2:
+            final = rng.standard_normal(rng.integers(stride // 2 + 1, 3 * frame_length)).astype(dtype)
+        if frames or final is not None:
+            streams.append((frames, final, stride))
+    return streams
+
+
+def batch_stream(frames, final, stride):
+    """Chunks as emitted by re-running _linear_overlap_add over all frames so far."""
+    cache, n_emitted, chunks = [], 0, []
+    for frame in frames:
+        cache.append(frame)
+        end = len(cache) * stride
+        chunks.append(_linear_overlap_add(cache, stride)[..., n_emitted:end])
+        n_emitted = end
+    if final is not None:
+        cache.append(final)
+        chunks.append(_linear_overlap_add(cache, stride)[..., n_emitted:])
+    return chunks
+
+
+def incremental_stream(frames, final, stride):
+    """Chunks as emitted by _StreamingOverlapAdd."""
+    overlap_add = _StreamingOverlapAdd(stride)
+    chunks = [overlap_add.add(frame) for frame in frames]
+    if final is not None:
+        chunks.append(np.concatenate([overlap_add.add(final), overlap_add.flush()], axis=-1))
+    return chunks
+
+
+def check_identical(streams):
+    """Return the indices of streams whose chunks differ between the two implementations."""
+    mismatches = []
+    for index, (frames, final, stride) in enumerate(streams):
+        expected = batch_stream(frames, final, stride)
+        actual = incremental_stream(frames, final, stride)
+        same = len(expected) == len(actual) and all(
+            a.dtype == b.dtype and a.shape == b.shape and np.array_equal(a, b) for a, b in zip(expected, actual)
+        )
+        if not same:
+            mismatches.append(index)
+    return mismatches
+
+
+def main(n_streams=300, n_chunks=(10, 100, 400)):
+    streams = random_streams(n_streams)
+    mismatches = check_identical(streams)
+    print(f"Random streams: {len(streams) - len(mismatches)}/{len(streams)} identical")
+    for index in mismatches[:5]:
+        print(f"  ❌ stream {index}")
+
+    stride, frame_length = 50 * 480, 52 * 480
+    frame = np.random.default_rng(0).standard_normal(frame_length).astype(np.float32)
+    for n in n_chunks:
+        cache = []
+        start = time.perf_counter()
+        for _ in range(n):
+            cache.append(frame)
+            _linear_overlap_add(cache, stride)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        overlap_add = _StreamingOverlapAdd(stride)
+        start = time.perf_counter()
+        for _ in range(n):
+            overlap_add.add(frame)
+        incremental_ms = (time.perf_counter() - start) * 1000
+        print(f"{n} chunks: batch OLA {batch_ms:.1f} ms, streaming OLA {incremental_ms:.1f} ms")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check streaming overlap-add against the batch version and time both")
+    parser.add_argument("--streams", type=int, default=300, help="Number of random streams to compare")
+    args = parser.parse_args()
+    sys.exit(main(n_streams=args.streams))
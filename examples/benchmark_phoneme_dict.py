@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.compact_phoneme_dict import build_compact_phoneme_dict, default_compact_path, CompactPhonemeDict
+
+PHONEME_DICT_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "phoneme_dict.json")
+
+
+def read_memory_kb():
+    """
+    Return (RSS, anonymous RSS) of this process in kB, from /proc (Linux only).
+
+    Anonymous memory is what each worker pays for itself; file-backed pages
+    of the mapped dictionary are shared between processes.
+    """
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "RssAnon"):
+                values[key] = int(rest.split()[0])
+    return values["VmRSS"], values["RssAnon"]
+
+
+def sample_words(json_path, lookups):
+    """Draw from a few thousand dictionary words plus some unknown words, like a long document."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        rng = random.Random(0)
+        vocabulary = rng.sample(list(json.load(f)), 4000)
+    return [rng.choice(vocabulary) if rng.random() < 0.9 else f"oov{i % 500}" for i in range(lookups)]
+
+
+def measure(kind, path, lookups):
+    """Load the dictionary in this process and report load time, memory and lookup speed."""
+    rss_before, anon_before = read_memory_kb()
+    start = time.perf_counter()
+    if kind == "json":
+        with open(path, "r", encoding="utf-8") as f:
+            phoneme_dict = json.load(f)
+    else:
+        phoneme_dict = CompactPhonemeDict(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_after, anon_after = read_memory_kb()
+
+    words = sample_words(os.path.abspath(PHONEME_DICT_PATH), lookups)
+    start = time.perf_counter()
+    for word in words:
+        phoneme_dict.get(word)
+    lookup_us = (time.perf_counter() - start) / len(words) * 1e6
+
+    # Second pass: every word seen before
+    start = time.perf_counter()
+    for word in words:
+        phoneme_dict.get(word)
+    repeat_lookup_us = (time.perf_counter() - start) / len(words) * 1e6
+
+    return {
+        "kind": kind,
+        "load_ms": load_ms,
+        "lookup_us": lookup_us,
+        "repeat_lookup_us": repeat_lookup_us,
+        "rss_mb": (rss_after - rss_before) / 1024,
+        "anon_mb": (anon_after - anon_before) / 1024,
+    }
+
+
+def main(lookups=20000):
+    json_path = os.path.abspath(PHONEME_DICT_PATH)
+    compact_path = default_compact_path(json_path)
+
+    start = time.perf_counter()
+    build_compact_phoneme_dict(json_path, compact_path)
+    print(f"Build: {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{os.path.getsize(json_path) / 1e6:.2f} MB JSON -> {os.path.getsize(compact_path) / 1e6:.2f} MB compact")
+
+    # Each measurement runs in a fresh interpreter so earlier allocations do not skew memory
+    for kind, path in (("json", json_path), ("compact", compact_path)):
+        output = subprocess.run(
+            [sys.executable, __file__, "--measure", kind, path, "--lookups", str(lookups)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f"{result['kind']:>8}: load {result['load_ms']:7.2f} ms | "
+              f"RSS +{result['rss_mb']:5.1f} MB (anonymous +{result['anon_mb']:5.1f} MB) | "
+              f"lookup {result['lookup_us']:.2f} us, repeated {result['repeat_lookup_us']:.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the JSON and memory-mapped phoneme dictionaries")
+    parser.add_argument("--lookups", type=int, default=20000, help="Number of random word lookups")
+    parser.add_argument("--measure", nargs=2, metavar=("KIND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        kind, path = args.measure
+        print(json.dumps(measure(kind, path, args.lookups)))
+    else:
+        main(lookups=args.lookups)
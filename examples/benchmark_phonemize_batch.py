@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from phonemizer import phonemize
+
+from utils.phonemize_text import _phonemize_words, get_normalizer
+
+LONG_TEXT = os.path.join(os.path.dirname(__file__), "sample_long_text.txt")
+# Standalone punctuation is not in phoneme_dict.json, and phonemizer merges runs of it
+PUNCTUATION_TEXT = "Xin chào ! Bạn khỏe không ? Giá : 50 % ; liên hệ @ vieneu ... rồi !? Hết :"
+
+
+def phonemize_one_by_one(words):
+    """The reference: one espeak call per word, as phonemize_with_dict used to do."""
+    learned = {}
+    for word in words:
+        phone_word = phonemize(
+            word,
+            language='vi',
+            backend='espeak',
+            preserve_punctuation=True,
+            with_stress=True,
+            language_switch='remove-flags'
+        )
+        if word.lower().startswith('r'):
+            phone_word = 'ɹ' + phone_word[1:]
+        learned[word] = phone_word
+    return learned
+
+
+def collect_words(max_words):
+    """Distinct words of the sample text plus standalone punctuation, in order of appearance."""
+    with open(LONG_TEXT, "r", encoding="utf-8") as f:
+        text = get_normalizer().normalize(f.read())
+    words = list(dict.fromkeys(PUNCTUATION_TEXT.split() + text.split()))
+    return words[:max_words]
+
+
+def main(max_words=300):
+    words = collect_words(max_words)
+
+    start = time.perf_counter()
+    expected = phonemize_one_by_one(words)
+    one_by_one_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    batched = _phonemize_words(words)
+    batched_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = [word for word in words if batched.get(word) != expected[word]]
+    print(f"Words: {len(words) - len(mismatches)}/{len(words)} identical")
+    for word in mismatches[:5]:
+        print(f"  ❌ {word!r}: batched {batched.get(word)!r}, one by one {expected[word]!r}")
+    print(f"One by one: {one_by_one_ms:.0f} ms, batched: {batched_ms:.0f} ms")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check batched espeak phonemization against word-by-word calls")
+    parser.add_argument("--words", type=int, default=300, help="Number of distinct words to phonemize")
+    args = parser.parse_args()
+    sys.exit(main(max_words=args.words))
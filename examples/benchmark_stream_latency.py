@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vieneu_tts import VieNeuTTS
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "sample")
+DEFAULT_TEXT = (
+    "Hà Nội là thủ đô của nước Cộng hòa Xã hội chủ nghĩa Việt Nam, "
+    "một thành phố có lịch sử hơn một nghìn năm với nhiều di tích và danh lam thắng cảnh."
+)
+
+
+def time_full(tts, text, ref_codes, ref_text, seed=None):
+    """Seconds until infer() returns the whole utterance."""
+    start = time.perf_counter()
+    wav = tts.infer(text, ref_codes, ref_text, seed=seed)
+    return time.perf_counter() - start, len(wav)
+
+
+def time_stream(tts, text, ref_codes, ref_text, seed=None):
+    """Seconds until infer_stream() yields its first chunk, and until it finishes."""
+    start = time.perf_counter()
+    first_chunk = None
+    n_samples = 0
+    for chunk in tts.infer_stream(text, ref_codes, ref_text, seed=seed):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        n_samples += len(chunk)
+    return first_chunk, time.perf_counter() - start, n_samples
+
+
+def main(text, voice, backbone_repo, device, runs, seed):
+    ref_codes = torch.load(os.path.join(SAMPLE_DIR, f"{voice}.pt"), map_location="cpu")
+    with open(os.path.join(SAMPLE_DIR, f"{voice}.txt"), "r", encoding="utf-8") as f:
+        ref_text = f.read()
+
+    tts = VieNeuTTS(
+        backbone_repo=backbone_repo,
+        backbone_device=device,
+        codec_repo="neuphonic/neucodec",
+        codec_device=device,
+    )
+    tts.prepare_voice(ref_codes, ref_text)
+
+    # Warm-up run so model loading and first-call costs are not measured
+    time_full(tts, text, ref_codes, ref_text, seed)
+
+    full, first, stream_total = [], [], []
+    for _ in range(runs):
+        seconds, n_samples = time_full(tts, text, ref_codes, ref_text, seed)
+        full.append(seconds)
+        first_chunk, seconds, _ = time_stream(tts, text, ref_codes, ref_text, seed)
+        first.append(first_chunk)
+        stream_total.append(seconds)
+
+    print(f"{backbone_repo} on {device}, {len(text)} chars, ~{n_samples / tts.sample_rate:.1f} s of audio, {runs} runs")
+    print(f"  infer():        first audio after {np.median(full):.2f} s")
+    print(f"  infer_stream(): first audio after {np.median(first):.2f} s, done after {np.median(stream_total):.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare time to first audio of infer() and infer_stream()")
+    parser.add_argument("--text", default=DEFAULT_TEXT, help="Text to synthesize")
+    parser.add_argument("--voice", default="Vĩnh (nam miền Nam)", help="Sample voice name in sample/")
+    parser.add_argument("--backbone", default="pnnbao-ump/VieNeu-TTS", help="Backbone repo (Transformers or GGUF)")
+    parser.add_argument("--device", default="cpu", help="Backbone and codec device")
+    parser.add_argument("--runs", type=int, default=3, help="Number of timed runs")
+    parser.add_argument("--seed", type=int, default=None, help="Sampling seed, so every run generates the same audio")
+    args = parser.parse_args()
+    main(args.text, args.voice, args.backbone, args.device, args.runs, args.seed)
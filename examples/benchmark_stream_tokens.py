@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vieneu_tts.vieneu_tts import _SpeechCodeBuffer, _build_speech_code_lut
+
+# Token layout like the VieNeu-TTS vocabulary: text tokens, then the speech tokens
+SPEECH_TOKEN_OFFSET = 151_669
+N_SPEECH_TOKENS = 65_536
+
+
+def old_stream(generated_ids, ref_codes, frames_per_chunk):
+    """Previous FastVieNeuTTS.infer_stream bookkeeping: list of token strings, diffed by joining."""
+    token_cache = [f"<|speech_{idx}|>" for idx in ref_codes]
+    n_decoded_tokens = len(ref_codes)
+    output_str = ""
+    step_times = []
+    for token_id in generated_ids:
+        # Cumulative response text, as the old loop expected it
+        output_str += f"<|speech_{token_id - SPEECH_TOKEN_OFFSET}|>"
+        start = time.perf_counter()
+        new_tokens = output_str[len("".join(token_cache[len(ref_codes):])):] if len(token_cache) > len(ref_codes) else output_str
+        if new_tokens:
+            token_cache.append(new_tokens)
+        if len(token_cache[n_decoded_tokens:]) >= frames_per_chunk:
+            curr_codes = "".join(token_cache[n_decoded_tokens:])
+            np.array([int(num) for num in curr_codes.replace("<|speech_", " ").replace("|>", " ").split()])
+            n_decoded_tokens += frames_per_chunk
+        step_times.append(time.perf_counter() - start)
+    return step_times
+
+
+def new_stream(generated_ids, ref_codes, frames_per_chunk, lut):
+    """Current bookkeeping: token ID deltas appended to a preallocated code array."""
+    token_cache = _SpeechCodeBuffer(ref_codes, capacity=len(ref_codes) + len(generated_ids))
+    n_decoded_tokens = len(ref_codes)
+    step_times = []
+    for token_id in generated_ids:
+        delta = [token_id]
+        start = time.perf_counter()
+        token_cache.extend_token_ids(delta, lut)
+        if len(token_cache) - n_decoded_tokens >= frames_per_chunk:
+            token_cache[n_decoded_tokens:n_decoded_tokens + frames_per_chunk]
+            n_decoded_tokens += frames_per_chunk
+        step_times.append(time.perf_counter() - start)
+    return step_times
+
+
+def main(n_tokens=2048, n_ref_codes=250, frames_per_chunk=50, buckets=8):
+    vocab = {f"<|speech_{i}|>": SPEECH_TOKEN_OFFSET + i for i in range(N_SPEECH_TOKENS)}
+    lut = _build_speech_code_lut(vocab)
+
+    rng = np.random.default_rng(0)
+    ref_codes = rng.integers(0, N_SPEECH_TOKENS, n_ref_codes).tolist()
+    generated_ids = (SPEECH_TOKEN_OFFSET + rng.integers(0, N_SPEECH_TOKENS, n_tokens)).tolist()
+
+    results = {
+        "old": old_stream(generated_ids, ref_codes, frames_per_chunk),
+        "new": new_stream(generated_ids, ref_codes, frames_per_chunk, lut),
+    }
+
+    size = n_tokens // buckets
+    print(f"Per-token bookkeeping overhead (us), {n_tokens} streamed tokens, excluding codec decode")
+    print("tokens        " + "".join(f"{name:>10}" for name in results))
+    for b in range(buckets):
+        row = "".join(
+            f"{np.mean(times[b * size:(b + 1) * size]) * 1e6:10.2f}" for times in results.values()
+        )
+        print(f"{b * size:5d}-{(b + 1) * size:<7d}{row}")
+    for name, times in results.items():
+        print(f"{name}: total {sum(times) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark streaming token bookkeeping in FastVieNeuTTS.infer_stream")
+    parser.add_argument("--tokens", type=int, default=2048, help="Number of generated tokens")
+    args = parser.parse_args()
+    main(n_tokens=args.tokens)
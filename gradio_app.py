@@ -358,11 +358,11 @@ def synthesize_speech(text: str, voice_choice: str, custom_audio, custom_text: s
     # === STANDARD MODE ===
     if generation_mode == "Standard (Một lần)":
         backend_name = "LMDeploy" if using_lmdeploy else "Standard"
-        batch_info = " (Batch Mode)" if use_batch and using_lmdeploy and total_chunks > 1 else ""
+        batch_info = " (Batch Mode)" if use_batch and hasattr(tts, 'infer_batch') and total_chunks > 1 else ""
         
         # Show batch size info
         batch_size_info = ""
-        if use_batch and using_lmdeploy and hasattr(tts, 'max_batch_size'):
+        if use_batch and hasattr(tts, 'max_batch_size'):
             batch_size_info = f" [Max batch: {tts.max_batch_size}]"
         
         yield None, f"🚀 Bắt đầu tổng hợp {backend_name}{batch_info}{batch_size_info} ({total_chunks} đoạn)..."
@@ -374,8 +374,8 @@ def synthesize_speech(text: str, voice_choice: str, custom_audio, custom_text: s
         start_time = time.time()
         
         try:
-            # Use batch processing if enabled and using LMDeploy
-            if use_batch and using_lmdeploy and hasattr(tts, 'infer_batch') and total_chunks > 1:
+            # Use batch processing if enabled
+            if use_batch and hasattr(tts, 'infer_batch') and total_chunks > 1:
                 # Show how many mini-batches will be processed
                 batch_size = tts.max_batch_size if hasattr(tts, 'max_batch_size') else 8
                 num_batches = (total_chunks + batch_size - 1) // batch_size
@@ -717,7 +717,7 @@ with gr.Blocks(theme=theme, css=css, title="VieNeu-TTS") as demo:
                 use_batch = gr.Checkbox(
                     value=True, 
                     label="⚡ Batch Processing",
-                    info="Xử lý nhiều đoạn cùng lúc (chỉ áp dụng khi sử dụng GPU và đã cài đặt LMDeploy)"
+                    info="Xử lý nhiều đoạn cùng lúc"
                 )
                 
                 current_mode = gr.Textbox(visible=False, value="preset_mode")
@@ -0,0 +1,148 @@
+"""
+Content-addressed cache of synthesized audio.
+
+Audio is cached per text chunk, so a long document that repeats a sentence,
+or shares sentences with an earlier request, only synthesizes the new ones.
+A chunk's key hashes everything that determines its audio: the normalized
+text, the reference voice (codes and transcript), the model and codec, and
+the sampling settings. Entries live in a size-bounded in-memory LRU and,
+when disk_dir is set, in .npy files that survive restarts and are promoted
+back to memory on a hit.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_cache_text(text: str) -> str:
+    """Text as it matters for the audio: NFC, single spaces, no outer whitespace."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def audio_cache_key(text: str, ref_codes, ref_text: str, model_id: str, **settings) -> str:
+    """SHA-256 hex key of one chunk; settings are the sampling parameters (any order)."""
+    h = hashlib.sha256()
+    for part in (
+        normalize_cache_text(text),
+        normalize_cache_text(ref_text),
+        hashlib.sha256(np.asarray(ref_codes, dtype=np.int64).tobytes()).hexdigest(),
+        model_id,
+        repr(sorted(settings.items())),
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class AudioCache:
+    """
+    Two-tier LRU cache of waveforms keyed by audio_cache_key().
+
+    At most max_bytes of audio are kept in memory; the least recently used
+    entries are dropped first. With disk_dir set, every entry is also written
+    there, and the disk tier is not size-limited. Safe to use from several
+    threads. Cached arrays are read-only.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key: str):
+        """Cached waveform for key, or None."""
+        with self._lock:
+            wav = self._entries.get(key)
+            if wav is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return wav
+
+        wav = self._load(key)
+        with self._lock:
+            if wav is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, wav)
+        return wav
+
+    def put(self, key: str, wav: np.ndarray):
+        wav = np.array(wav, dtype=np.float32)
+        wav.setflags(write=False)
+        with self._lock:
+            self._remember(key, wav)
+        if self.disk_dir:
+            self._store(key, wav)
+
+    def clear(self):
+        """Drop the in-memory entries (files on disk are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'memory_mb': self._bytes / 2**20,
+                'max_memory_mb': self.max_bytes / 2**20,
+                'disk_dir': self.disk_dir,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key: str, wav: np.ndarray):
+        # Caller holds the lock
+        if wav.nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = wav
+        self._bytes += wav.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _path(self, key: str) -> str:
+        # Two-character fan-out keeps directories small
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npy")
+
+    def _load(self, key: str):
+        if not self.disk_dir:
+            return None
+        try:
+            wav = np.load(self._path(key), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        wav.setflags(write=False)
+        return wav
+
+    def _store(self, key: str, wav: np.ndarray):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, wav, allow_pickle=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write audio cache entry: {e}")
@@ -0,0 +1,48 @@
+"""
+In-memory audio encoding for API responses.
+
+Waveforms are encoded straight into a BytesIO with libsndfile (through
+soundfile), so serving a request never touches the disk. MP3 needs
+libsndfile >= 1.1; with an older one it falls back to pydub, which needs
+ffmpeg.
+"""
+import io
+
+import numpy as np
+import soundfile as sf
+
+# format -> (libsndfile format, subtype, media type)
+AUDIO_FORMATS = {
+    "wav": ("WAV", "PCM_16", "audio/wav"),
+    "mp3": ("MP3", "MPEG_LAYER_III", "audio/mpeg"),
+    "ogg": ("OGG", "OPUS", "audio/ogg"),
+    "flac": ("FLAC", "PCM_16", "audio/flac"),
+}
+
+
+def audio_media_type(audio_format: str) -> str:
+    return AUDIO_FORMATS[audio_format][2]
+
+
+def encode_audio(wav: np.ndarray, sr: int, audio_format: str = "wav") -> bytes:
+    """Encode a mono float waveform as wav, mp3, ogg (Opus) or flac; returns the file's bytes."""
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported audio format: {audio_format}. Choose from {', '.join(AUDIO_FORMATS)}")
+    file_format, subtype, _ = AUDIO_FORMATS[audio_format]
+
+    if audio_format == "mp3" and "MP3" not in sf.available_formats():
+        return _encode_mp3_pydub(wav, sr)
+
+    buffer = io.BytesIO()
+    sf.write(buffer, wav, sr, format=file_format, subtype=subtype)
+    return buffer.getvalue()
+
+
+def _encode_mp3_pydub(wav: np.ndarray, sr: int) -> bytes:
+    from pydub import AudioSegment
+
+    pcm = (np.clip(wav, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    audio = AudioSegment(data=pcm, sample_width=2, frame_rate=sr, channels=1)
+    buffer = io.BytesIO()
+    audio.export(buffer, format="mp3", bitrate="128k")
+    return buffer.getvalue()
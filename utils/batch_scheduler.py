@@ -0,0 +1,327 @@
+"""
+Dynamic batching of synthesis jobs across concurrent requests.
+
+Each request splits its text into chunks and submits them as jobs. A single
+worker thread owns the model: it takes the oldest queued job, waits up to
+max_wait for more jobs with the same reference voice, and runs them together
+through the backend's infer_batch(). Results are delivered to each job's
+future, so every request gets its own chunks back in order while batches are
+shared between requests, and synthesis calls never interleave.
+
+Streaming jobs run alone through infer_stream() on the same worker, handing
+each audio part to a callback as it is produced. A job may name the backend
+it runs on, so requests for several resident models share the queue. Jobs
+with a higher priority (e.g. realtime requests) are served before queued
+jobs with a lower one (e.g. bulk documents), whatever their arrival order.
+A backend that runs calls in parallel (e.g. GGUFWorkerPool's processes) can
+be served by several worker threads, each taking the next batch in turn.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class SchedulerFullError(RuntimeError):
+    """Raised by BatchScheduler.submit() when the job queue is full."""
+
+
+class _Job:
+    """One text chunk waiting to be synthesized."""
+
+    __slots__ = (
+        "text", "ref_codes", "ref_text", "voice_key", "batchable", "sampling", "backend", "priority", "future",
+        "enqueued_at", "on_audio", "cancel_event",
+    )
+
+    def __init__(self, text: str, ref_codes, ref_text: str, voice_key, batchable: bool, sampling: dict,
+                 backend=None, priority: int = 0, on_audio=None, cancel_event: threading.Event = None):
+        self.text = text
+        self.ref_codes = ref_codes
+        self.ref_text = ref_text
+        self.voice_key = voice_key
+        self.batchable = batchable
+        # Keyword arguments for infer/infer_batch/infer_stream (temperature, top_k, top_p, seed)
+        self.sampling = sampling
+        # Model to run on; None means the scheduler's current backend
+        self.backend = backend
+        self.priority = priority
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        # Streaming jobs only: called with each audio part, stopped early by cancel_event
+        self.on_audio = on_audio
+        self.cancel_event = cancel_event
+
+    def joins(self, head: "_Job") -> bool:
+        """Whether this job can run in the same batch as head."""
+        return (
+            self.batchable and self.voice_key == head.voice_key and self.sampling == head.sampling
+            and self.backend is head.backend and self.priority == head.priority
+        )
+
+
+class BatchScheduler:
+    """
+    Queue of chunk-level synthesis jobs served in dynamic batches.
+
+    get_backend returns the current VieNeuTTS / FastVieNeuTTS instance (or
+    None when no model is loaded); it is called for every batch, so a model
+    reloaded in between is picked up. max_batch_size of 0 uses the backend's
+    own max_batch_size. Jobs may instead name their backend, and only jobs
+    with the same backend, voice, sampling settings and priority share a
+    batch. Jobs that are not batchable, or a backend without infer_batch,
+    run one at a time through infer(). When a batch fails, its jobs are
+    retried one at a time, so only the failing chunk's request gets the
+    error. The next batch is built around the
+    oldest job of the highest priority; a steady flow of high-priority jobs
+    can therefore hold back lower ones. At most max_queued jobs wait at a
+    time (0 = unbounded); submit() rejects requests beyond that. workers
+    threads take batches concurrently; keep it at 1 unless every backend is
+    safe to call from several threads at once.
+    """
+
+    def __init__(self, get_backend, max_batch_size: int = 0, max_wait: float = 0.02, max_queued: int = 0,
+                 workers: int = 1):
+        self.get_backend = get_backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queued = max_queued
+        self.workers = workers
+        self.batches = 0
+        self.jobs = 0
+        self._running = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, texts: list[str], ref_codes, ref_text: str, batchable: bool = True, sampling: dict = None,
+               backend=None, priority: int = 0) -> list[Future]:
+        """
+        Queue texts for synthesis with one reference voice; returns one future per text.
+
+        sampling holds keyword arguments for the backend (temperature, top_k,
+        top_p, seed). backend is the model to run on (default: get_backend()
+        when the job runs). Jobs of a higher priority run first. Raises
+        SchedulerFullError, queueing nothing, if the texts do not fit in the
+        queue.
+        """
+        voice_key = (ref_text, np.asarray(ref_codes).tobytes())
+        jobs = [
+            _Job(text, ref_codes, ref_text, voice_key, batchable, sampling or {}, backend, priority)
+            for text in texts
+        ]
+        return self._enqueue(jobs)
+
+    def submit_stream(self, texts: list[str], ref_codes, ref_text: str, on_audio, cancel_event: threading.Event,
+                      sampling: dict = None, backend=None, priority: int = 0) -> list[Future]:
+        """
+        Queue texts for streaming synthesis, one job per text, started in order.
+
+        on_audio(index, audio) is called from the worker thread for every part
+        infer_stream() yields for texts[index]; each future resolves once its
+        text is complete. Setting cancel_event stops the running job after its
+        current part. Raises SchedulerFullError like submit().
+        """
+        jobs = [
+            _Job(text, ref_codes, ref_text, None, False, sampling or {}, backend, priority,
+                 on_audio=lambda audio, index=index: on_audio(index, audio), cancel_event=cancel_event)
+            for index, text in enumerate(texts)
+        ]
+        return self._enqueue(jobs)
+
+    def _enqueue(self, jobs: list[_Job]) -> list[Future]:
+        with self._cond:
+            if self.max_queued and len(self._queue) + len(jobs) > self.max_queued:
+                raise SchedulerFullError(f"Synthesis queue is full ({len(self._queue)} chunks waiting)")
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name="tts-batch-scheduler", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._queue.extend(jobs)
+            self._cond.notify(len(jobs))
+        return [job.future for job in jobs]
+
+    async def synthesize(self, texts: list[str], ref_codes, ref_text: str, batchable: bool = True,
+                         sampling: dict = None, backend=None, priority: int = 0) -> list[np.ndarray]:
+        """Synthesize texts without blocking the event loop; returns their waveforms in order."""
+        futures = self.submit(texts, ref_codes, ref_text, batchable, sampling, backend, priority)
+        return await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+    async def stream(self, texts: list[str], ref_codes, ref_text: str, sampling: dict = None, backend=None,
+                     priority: int = 0):
+        """
+        Stream texts one after another; yields (index, audio) as parts are produced.
+
+        After the last part of texts[index], (index, None) is yielded. Closing
+        the generator early cancels the remaining work. With several workers,
+        later texts may be synthesized while an earlier one streams; their
+        parts are held back so they are still yielded in text order.
+        """
+        loop = asyncio.get_running_loop()
+        parts = asyncio.Queue()
+        cancel_event = threading.Event()
+
+        def on_audio(index, audio):
+            loop.call_soon_threadsafe(parts.put_nowait, (index, audio))
+
+        futures = self.submit_stream(texts, ref_codes, ref_text, on_audio, cancel_event, sampling, backend, priority)
+        for index, future in enumerate(futures):
+            # Runs after the job's last on_audio call, so it is queued behind its parts
+            future.add_done_callback(
+                lambda _, index=index: loop.call_soon_threadsafe(parts.put_nowait, (index, None))
+            )
+        try:
+            held = {index: deque() for index in range(len(futures))}
+            current = 0
+            while current < len(futures):
+                if held[current]:
+                    audio = held[current].popleft()
+                else:
+                    index, audio = await parts.get()
+                    if index != current:
+                        held[index].append(audio)
+                        continue
+                if audio is None:
+                    # Re-raises an error of this text's synthesis
+                    futures[current].result()
+                    yield current, None
+                    current += 1
+                else:
+                    yield current, audio
+        finally:
+            cancel_event.set()
+            for future in futures:
+                future.cancel()
+
+    def pending(self) -> int:
+        """Jobs queued or being synthesized, a measure of how long a new job would wait."""
+        with self._cond:
+            return len(self._queue) + self._running
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            'queued_jobs': queued,
+            'running_jobs': self._running,
+            'batches': self.batches,
+            'jobs': self.jobs,
+            'avg_batch_size': self.jobs / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'max_queued': self.max_queued,
+            'workers': self.workers,
+        }
+
+    def _backend(self, job: _Job):
+        return job.backend if job.backend is not None else self.get_backend()
+
+    def _batch_limit(self, backend) -> int:
+        if backend is None or not hasattr(backend, 'infer_batch'):
+            return 1
+        return self.max_batch_size or getattr(backend, 'max_batch_size', 1)
+
+    def _head(self) -> _Job:
+        """Oldest job of the highest priority; the caller holds the lock."""
+        top = max(job.priority for job in self._queue)
+        return next(job for job in self._queue if job.priority == top)
+
+    def _next_batch(self) -> list[_Job]:
+        """Wait for the head job, then gather jobs that join it until the batch is full or max_wait passed."""
+        with self._cond:
+            while True:
+                if not self._queue:
+                    # Also when another worker took the jobs meanwhile
+                    self._cond.wait()
+                    continue
+                # Re-chosen after every wait, so a higher-priority arrival takes over
+                head = self._head()
+                limit = self._batch_limit(self._backend(head)) if head.batchable else 1
+                # The wait counts from when the head job arrived, so it is never held back twice
+                remaining = head.enqueued_at + self.max_wait - time.monotonic()
+                if limit <= 1 or remaining <= 0 or sum(job.joins(head) for job in self._queue) >= limit:
+                    break
+                self._cond.wait(remaining)
+
+            batch = [head]
+            rest = deque()
+            for job in self._queue:
+                if job is head:
+                    continue
+                if len(batch) < limit and job.joins(head):
+                    batch.append(job)
+                else:
+                    rest.append(job)
+            self._queue = rest
+            # Jobs whose request went away (e.g. client disconnected) are dropped here
+            batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            self._running += len(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            head = batch[0]
+            if head.on_audio is not None:
+                self._run_stream(head)
+            else:
+                self._run_batch(batch)
+            with self._cond:
+                self._running -= len(batch)
+                self.batches += 1
+                self.jobs += len(batch)
+
+    def _run_stream(self, job: _Job):
+        try:
+            backend = self._backend(job)
+            if backend is None:
+                raise RuntimeError("No TTS model is loaded")
+            with closing(backend.infer_stream(job.text, job.ref_codes, job.ref_text, **job.sampling)) as parts:
+                for audio in parts:
+                    if job.cancel_event.is_set():
+                        break
+                    job.on_audio(audio)
+        except Exception as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(None)
+
+    def _run_batch(self, batch: list[_Job]):
+        head = batch[0]
+        backend = self._backend(head)
+        if backend is None:
+            error = RuntimeError("No TTS model is loaded")
+            for job in batch:
+                job.future.set_exception(error)
+            return
+        if len(batch) == 1:
+            self._run_one(backend, head)
+            return
+        try:
+            wavs = backend.infer_batch(
+                [job.text for job in batch], head.ref_codes, head.ref_text, max_batch_size=len(batch),
+                **head.sampling
+            )
+        except Exception:
+            # Jobs of other requests must not fail with one bad chunk: retry each alone,
+            # so an error only reaches the request whose chunk caused it
+            for job in batch:
+                self._run_one(backend, job)
+        else:
+            for job, wav in zip(batch, wavs):
+                job.future.set_result(wav)
+
+    def _run_one(self, backend, job: _Job):
+        try:
+            wav = backend.infer(job.text, job.ref_codes, job.ref_text, **job.sampling)
+        except Exception as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(wav)
@@ -0,0 +1,209 @@
+"""
+Compact, memory-mapped form of the phoneme dictionary.
+
+phoneme_dict.json is compiled into a string table with a hash index:
+
+    header | key offsets | value offsets | hash slots | key bytes | value bytes
+
+Keys are UTF-8 and sorted bytewise. The slots form an open-addressing table
+keyed by CRC32 (stable across processes, unlike hash()), so a lookup touches
+one or two entries of the mapped file. Every process maps the same file read-only and shares its pages
+through the OS page cache instead of holding its own copy of a large dict.
+
+Build it ahead of time with:
+
+    python -m utils.compact_phoneme_dict [path/to/phoneme_dict.json]
+
+open_compact_phoneme_dict() also (re)builds it when it is missing or older
+than the JSON file.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from collections.abc import MutableMapping
+from functools import lru_cache
+
+MAGIC = b"VNPHDICT"
+VERSION = 1
+# Offsets are written in native byte order; the mark detects a foreign file.
+BYTE_ORDER_MARK = 0x01020304
+# magic, version, byte order mark, entry count, hash slot count, source size, source mtime (ns)
+HEADER = struct.Struct("=8sIIIIqq")
+
+
+def default_compact_path(json_path: str) -> str:
+    """Path of the compiled dictionary for a given JSON dictionary."""
+    return os.path.splitext(json_path)[0] + ".bin"
+
+
+def build_compact_phoneme_dict(json_path: str, compact_path: str = None) -> str:
+    """
+    Compile a JSON phoneme dictionary into the compact format.
+
+    The file is written next to its destination and moved into place, so
+    concurrent builders and readers never see a partial file.
+    """
+    compact_path = compact_path or default_compact_path(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    stat = os.stat(json_path)
+
+    items = sorted((word.encode("utf-8"), phones.encode("utf-8")) for word, phones in entries.items())
+    key_offsets = [0]
+    value_offsets = [0]
+    for key, value in items:
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(value))
+
+    # Power of two at least twice the entry count keeps probe chains short
+    slot_count = 1 << max(len(items) * 2, 1).bit_length()
+    slots = [0] * slot_count
+    for index, (key, _) in enumerate(items):
+        slot = zlib.crc32(key) & (slot_count - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = index + 1
+
+    header = HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, len(items), slot_count, stat.st_size, stat.st_mtime_ns)
+    offsets_format = f"={len(items) + 1}I"
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(compact_path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(struct.pack(offsets_format, *key_offsets))
+            f.write(struct.pack(offsets_format, *value_offsets))
+            f.write(struct.pack(f"={slot_count}I", *slots))
+            f.write(b"".join(key for key, _ in items))
+            f.write(b"".join(value for _, value in items))
+        os.replace(tmp_path, compact_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return compact_path
+
+
+def _is_fresh(compact_path: str, json_path: str) -> bool:
+    """Whether compact_path exists and was built from the current json_path."""
+    try:
+        with open(compact_path, "rb") as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return False
+    if len(header) < HEADER.size:
+        return False
+    magic, version, mark, _, _, size, mtime_ns = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or mark != BYTE_ORDER_MARK:
+        return False
+    try:
+        stat = os.stat(json_path)
+    except FileNotFoundError:
+        # Only the compiled dictionary was shipped
+        return True
+    return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+
+def open_compact_phoneme_dict(json_path: str, compact_path: str = None) -> "CompactPhonemeDict":
+    """Memory-map the compiled dictionary for json_path, building it first if missing or stale."""
+    compact_path = compact_path or default_compact_path(json_path)
+    if not _is_fresh(compact_path, json_path):
+        print(f"Building compact phoneme dictionary at {compact_path} ...")
+        build_compact_phoneme_dict(json_path, compact_path)
+    return CompactPhonemeDict(compact_path)
+
+
+class CompactPhonemeDict(MutableMapping):
+    """
+    Read-only memory-mapped phoneme dictionary with dict semantics.
+
+    Words assigned at runtime (e.g. learned from espeak) are kept in a small
+    in-memory overlay that takes precedence over the mapped entries.
+    """
+
+    def __init__(self, path: str, cache_size: int = 16384):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, mark, count, slot_count, _, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or mark != BYTE_ORDER_MARK:
+            self._mm.close()
+            raise ValueError(f"{path} is not a compact phoneme dictionary for this platform")
+
+        view = memoryview(self._mm)
+        start = HEADER.size
+        offsets_size = (count + 1) * 4
+        slots_start = start + 2 * offsets_size
+        self._key_offsets = view[start:start + offsets_size].cast("I")
+        self._value_offsets = view[start + offsets_size:slots_start].cast("I")
+        self._slots = view[slots_start:slots_start + slot_count * 4].cast("I")
+        self._keys_start = slots_start + slot_count * 4
+        self._values_start = self._keys_start + self._key_offsets[count]
+
+        self._count = count
+        self._mask = slot_count - 1
+        self._overlay = {}
+        self._lookup = lru_cache(maxsize=cache_size)(self._lookup_mapped)
+
+    def _key(self, i: int) -> bytes:
+        start = self._keys_start
+        return self._mm[start + self._key_offsets[i]:start + self._key_offsets[i + 1]]
+
+    def _lookup_mapped(self, word: str):
+        key = word.encode("utf-8")
+        mm, slots, key_offsets, mask = self._mm, self._slots, self._key_offsets, self._mask
+        keys_start = self._keys_start
+        slot = zlib.crc32(key) & mask
+        while index := slots[slot]:
+            if mm[keys_start + key_offsets[index - 1]:keys_start + key_offsets[index]] == key:
+                values_start = self._values_start
+                value_offsets = self._value_offsets
+                return mm[values_start + value_offsets[index - 1]:values_start + value_offsets[index]].decode("utf-8")
+            slot = (slot + 1) & mask
+        return None
+
+    def __getitem__(self, word):
+        if word in self._overlay:
+            return self._overlay[word]
+        phones = self._lookup(word) if isinstance(word, str) else None
+        if phones is None:
+            raise KeyError(word)
+        return phones
+
+    def __contains__(self, word):
+        if word in self._overlay:
+            return True
+        return isinstance(word, str) and self._lookup(word) is not None
+
+    def __setitem__(self, word, phones):
+        self._overlay[word] = phones
+
+    def __delitem__(self, word):
+        if word in self._overlay:
+            del self._overlay[word]
+        elif word in self:
+            raise TypeError(f"Cannot delete {word!r}: {self.path} is read-only")
+        else:
+            raise KeyError(word)
+
+    def __iter__(self):
+        for i in range(self._count):
+            word = self._key(i).decode("utf-8")
+            if word not in self._overlay:
+                yield word
+        yield from self._overlay
+
+    def __len__(self):
+        return self._count + sum(1 for word in self._overlay if self._lookup(word) is None)
+
+
+if __name__ == "__main__":
+    json_path = sys.argv[1] if len(sys.argv) > 1 else os.getenv(
+        "PHONEME_DICT_PATH", os.path.join(os.path.dirname(__file__), "phoneme_dict.json")
+    )
+    path = build_compact_phoneme_dict(json_path)
+    print(f"✅ Wrote {path} ({os.path.getsize(path) / 1e6:.2f} MB)")
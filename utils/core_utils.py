@@ -1,12 +1,16 @@
 import re
 from typing import List
+import numpy as np
+
+# End of a sentence: terminal punctuation followed by whitespace
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[\.\!\?\…])\s+")
 
 def split_text_into_chunks(text: str, max_chars: int = 256) -> List[str]:
     """
     Split raw text into chunks no longer than max_chars.
     Preference is given to sentence boundaries; otherwise falls back to word-based splitting.
     """
-    sentences = re.split(r"(?<=[\.\!\?\…])\s+", text.strip())
+    sentences = SENTENCE_BOUNDARY_RE.split(text.strip())
     chunks: List[str] = []
     buffer = ""
 
@@ -45,3 +49,90 @@ def split_text_into_chunks(text: str, max_chars: int = 256) -> List[str]:
 
     flush_buffer()
     return [chunk for chunk in chunks if chunk]
+
+
+class IncrementalTextChunker:
+    """
+    Split text that arrives in fragments (e.g. tokens from an LLM) into chunks
+    as soon as they are complete.
+
+    A chunk ends at a sentence boundary, as in split_text_into_chunks(), so a
+    sentence is released once the whitespace after its final punctuation has
+    arrived. Text running past max_chars without one is cut at the last space.
+    """
+
+    def __init__(self, max_chars: int = 256):
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, fragment: str) -> List[str]:
+        """Add a text fragment; returns the chunks it completed."""
+        self._buffer += fragment
+        chunks = []
+        while True:
+            match = SENTENCE_BOUNDARY_RE.search(self._buffer)
+            if match and match.start() <= self.max_chars:
+                start, end = match.start(), match.end()
+            elif len(self._buffer) > self.max_chars:
+                start = self._buffer.rfind(" ", 0, self.max_chars + 1)
+                if start <= 0:
+                    start = self.max_chars
+                end = start
+            else:
+                break
+            chunk = self._buffer[:start].strip()
+            self._buffer = self._buffer[end:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Return the remaining text as chunks, complete or not."""
+        text, self._buffer = self._buffer, ""
+        return split_text_into_chunks(text, max_chars=self.max_chars)
+
+    def clear(self):
+        self._buffer = ""
+
+
+class StreamCrossfader:
+    """
+    Join streamed audio of consecutive text chunks with a short linear crossfade.
+
+    Audio passes through as it arrives, except for the last crossfade_samples,
+    which are held back until it is known whether the next part continues the
+    same chunk or starts a new one (see start_segment()).
+    """
+
+    def __init__(self, crossfade_samples: int):
+        self.crossfade_samples = crossfade_samples
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._crossfade_next = False
+
+    def start_segment(self):
+        """The next audio starts a new text chunk and is crossfaded with the held tail."""
+        self._crossfade_next = len(self._tail) > 0
+
+    def add(self, audio: np.ndarray) -> np.ndarray:
+        """Feed audio; returns the audio that is ready to be played."""
+        if len(audio) == 0:
+            return audio
+        if self._crossfade_next:
+            overlap = min(len(self._tail), len(audio), self.crossfade_samples)
+            fade_out = np.linspace(1.0, 0.0, overlap, dtype=np.float32)
+            fade_in = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+            blended = self._tail[len(self._tail) - overlap:] * fade_out + audio[:overlap] * fade_in
+            audio = np.concatenate([self._tail[:len(self._tail) - overlap], blended, audio[overlap:]])
+            self._crossfade_next = False
+        else:
+            audio = np.concatenate([self._tail, audio])
+        keep = min(self.crossfade_samples, len(audio))
+        self._tail = audio[len(audio) - keep:]
+        return audio[:len(audio) - keep]
+
+    def flush(self) -> np.ndarray:
+        """Return the held-back end of the audio."""
+        tail = self._tail
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._crossfade_next = False
+        return tail
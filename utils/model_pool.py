@@ -0,0 +1,203 @@
+"""
+Pool of loaded TTS models kept warm side by side.
+
+Each (backbone, codec, device) combination is loaded once and stays
+resident, so requests can switch between models without a reload. The
+pool is bounded by a number of models and a memory budget; when a load
+would exceed either, the least recently used models are dropped first.
+A dropped model is freed once the requests still running on it finish.
+"""
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+
+
+def model_id(backbone: str, codec: str, device: str) -> str:
+    """ID of a model combination, as requests name it."""
+    return f"{backbone}|{codec}|{device}"
+
+
+def parse_model_id(model: str) -> tuple[str, str, str]:
+    """Inverse of model_id(); raises ValueError for a malformed ID."""
+    parts = model.split("|")
+    if len(parts) != 3:
+        raise ValueError(f"Invalid model ID: {model}. Expected 'backbone|codec|device'")
+    return tuple(parts)
+
+
+def estimate_model_bytes(tts) -> int:
+    """Size of the backbone and codec weights; a GGUF backbone counts its file size."""
+    total = 0
+    for part in (getattr(tts, "backbone", None), getattr(tts, "codec", None)):
+        if isinstance(part, torch.nn.Module):
+            total += sum(t.numel() * t.element_size() for t in part.parameters())
+            total += sum(t.numel() * t.element_size() for t in part.buffers())
+        elif isinstance(getattr(part, "model_path", None), str) and os.path.exists(part.model_path):
+            total += os.path.getsize(part.model_path)
+    return total
+
+
+def _cuda_free_bytes() -> int:
+    if not torch.cuda.is_available():
+        return 0
+    free, _ = torch.cuda.mem_get_info()
+    return free
+
+
+class PooledModel:
+    """A resident model and what it was loaded as."""
+
+    def __init__(self, model_id: str, tts, backbone: str, codec: str, device: str, using_lmdeploy: bool,
+                 memory_bytes: int, load_seconds: float):
+        self.model_id = model_id
+        self.tts = tts
+        self.backbone = backbone
+        self.codec = codec
+        self.device = device
+        self.using_lmdeploy = using_lmdeploy
+        self.memory_bytes = memory_bytes
+        self.load_seconds = load_seconds
+        self.last_used = time.time()
+        # Pinned models are never evicted (e.g. the engines of a router)
+        self.pinned = False
+
+    def info(self) -> dict:
+        return {
+            'model': self.model_id,
+            'backbone': self.backbone,
+            'codec': self.codec,
+            'device': self.device,
+            'using_lmdeploy': self.using_lmdeploy,
+            'memory_mb': self.memory_bytes / 2**20,
+            'load_seconds': self.load_seconds,
+            'last_used': self.last_used,
+            'pinned': self.pinned,
+        }
+
+
+class ModelPool:
+    """
+    LRU of resident models keyed by model_id().
+
+    get() returns a resident model without blocking on loads. get_or_load()
+    loads a missing one with load(), which returns (tts, using_lmdeploy);
+    loads run one at a time. At most max_models stay resident (0 =
+    unbounded) and, with max_bytes set, their estimated memory stays within
+    it: weights as counted by estimate_model_bytes(), or the CUDA memory the
+    load took if that is more (e.g. LMDeploy's KV cache). A model bigger
+    than the whole budget is still loaded, alone. Models loaded with pin=True
+    are never evicted, but count against the limits. on_evict(entry) is
+    called after a model is dropped, e.g. to release GPU memory.
+    """
+
+    def __init__(self, max_models: int = 2, max_bytes: int = 0, on_evict=None):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.loads = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # Sizes of models seen before, to make room before loading them again
+        self._known_bytes = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def get(self, model: str):
+        """The resident model with this ID (marking it recently used), or None."""
+        with self._lock:
+            entry = self._entries.get(model)
+            if entry is not None:
+                self._entries.move_to_end(model)
+                entry.last_used = time.time()
+            return entry
+
+    def get_or_load(self, model: str, load, pin: bool = False) -> PooledModel:
+        entry = self.get(model)
+        if entry is not None:
+            entry.pinned = entry.pinned or pin
+            return entry
+
+        with self._load_lock:
+            # Loaded by another request meanwhile
+            entry = self.get(model)
+            if entry is not None:
+                entry.pinned = entry.pinned or pin
+                return entry
+
+            self._make_room(self._known_bytes.get(model, 0), slots=1)
+            backbone, codec, device = parse_model_id(model)
+            print(f"📦 Loading model into pool: {model}")
+            start = time.perf_counter()
+            free_before = _cuda_free_bytes()
+            tts, using_lmdeploy = load()
+            cuda_bytes = max(0, free_before - _cuda_free_bytes())
+            memory_bytes = max(estimate_model_bytes(tts), cuda_bytes)
+            entry = PooledModel(model, tts, backbone, codec, device, using_lmdeploy, memory_bytes,
+                                time.perf_counter() - start)
+            entry.pinned = pin
+            self._known_bytes[model] = memory_bytes
+
+            with self._lock:
+                self._entries[model] = entry
+                self.loads += 1
+            # The new model's real size may need more room than estimated
+            self._make_room(0, slots=0, keep=model)
+            print(f"✅ Model resident: {model} ({memory_bytes / 2**20:.0f} MB, {entry.load_seconds:.1f}s)")
+            return entry
+
+    def evict(self, model: str) -> bool:
+        """Drop a resident model; returns whether it was resident."""
+        with self._lock:
+            entry = self._entries.pop(model, None)
+        if entry is None:
+            return False
+        self._evicted(entry)
+        return True
+
+    def models(self) -> list[PooledModel]:
+        """Resident models, least recently used first."""
+        with self._lock:
+            return list(self._entries.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            used = sum(entry.memory_bytes for entry in self._entries.values())
+            return {
+                'resident': [entry.info() for entry in self._entries.values()],
+                'memory_mb': used / 2**20,
+                'max_memory_mb': self.max_bytes / 2**20 if self.max_bytes else None,
+                'max_models': self.max_models,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
+
+    def _make_room(self, extra_bytes: int, slots: int, keep: str = None):
+        """
+        Evict LRU models until slots more models and extra_bytes more memory fit.
+
+        Keeps at least one model, pinned ones and keep.
+        """
+        while True:
+            with self._lock:
+                used = sum(entry.memory_bytes for entry in self._entries.values())
+                too_many = self.max_models and len(self._entries) + slots > self.max_models
+                too_big = self.max_bytes and used + extra_bytes > self.max_bytes
+                if not (too_many or too_big) or len(self._entries) <= 1 - slots:
+                    return
+                evictable = [key for key, entry in self._entries.items() if not entry.pinned and key != keep]
+                if not evictable:
+                    return
+                entry = self._entries.pop(evictable[0])
+            self._evicted(entry)
+
+    def _evicted(self, entry: PooledModel):
+        print(f"♻️ Evicting model from pool: {entry.model_id} ({entry.memory_bytes / 2**20:.0f} MB)")
+        self.evictions += 1
+        # Requests still holding the entry keep its model alive until they finish
+        gc.collect()
+        if self.on_evict is not None:
+            self.on_evict(entry)
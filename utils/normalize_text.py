@@ -1,5 +1,27 @@
 import re
 
+
+def _trie_pattern(words):
+    """Build a regex alternation for words, factored by common prefix."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def render(node):
+        branches = [re.escape(char) + render(child) for char, child in node.items() if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            return body + '?' if len(branches) > 1 else '(?:' + body + ')?'
+        return body
+    
+    return render(trie)
+
+
 class VietnameseTTSNormalizer:
     """
     A text normalizer for Vietnamese Text-to-Speech systems.
@@ -43,6 +65,110 @@ class VietnameseTTSNormalizer:
         
         self.digits = ['không', 'một', 'hai', 'ba', 'bốn', 
                       'năm', 'sáu', 'bảy', 'tám', 'chín']
+        
+        self._compile_patterns()
+    
+    def _compile_patterns(self):
+        """
+        Compile every pattern used by normalize() once, at construction.
+        
+        Rules that cannot interfere with each other are fused into a single
+        alternation and dispatched on the group that matched, so the text is
+        scanned once per fused pass instead of once per rule. Rules that read
+        the output of an earlier rule keep their own pass, in the original order.
+        """
+        number = r'\d+(?:[.,]\d+)?'
+        # For rules where a number is always followed by a non-digit, the number
+        # never has to give digits back and a match can only start where a digit
+        # run starts, so it is matched atomically behind a (?<!\d) guard.
+        atomic_number = rf'(?>{number})'
+        
+        self._temperature_re = re.compile(
+            rf'(?P<temp>(?P<temp_sign>-)?(?P<temp_value>{number})\s*°\s*(?P<temp_scale>[cf])\b)'
+            r'|(?P<degree>°)',
+            re.IGNORECASE
+        )
+        
+        self._currency_re = re.compile(
+            r'(?<!\d)(?:'
+            r'(?i:(?P<decimal>(?P<dec_whole>\d++)[.,](?P<dec_frac>\d++)\s*(?P<dec_unit>[kmb])\b))'
+            r'|(?i:(?P<scaled>(?P<scaled_value>\d++)\s*(?P<scaled_unit>[kmb])\b))'
+            rf'|(?P<dong>(?P<dong_value>{atomic_number})\s*đ\b)'
+            rf'|(?i:(?P<vnd>(?P<vnd_value>{atomic_number})\s*vnd\b))'
+            r')'
+        )
+        self._dollar_prefix_re = re.compile(rf'\$\s*({number})')
+        self._dollar_suffix_re = re.compile(rf'(?<!\d)({atomic_number})\s*\$')
+        self._percentage_re = re.compile(rf'(?<!\d)({atomic_number})\s*%')
+        
+        self._compound_unit_number_re = re.compile(
+            rf'({number})\s*([a-zA-Zμµ²³°]+)/([a-zA-Zμµ²³°0-9]+)\b'
+        )
+        self._compound_unit_re = re.compile(r'\b([a-zA-Zμµ²³°]+)/([a-zA-Zμµ²³°0-9]+)\b')
+        
+        # Every unit is made of word characters and must end at a word boundary,
+        # so at most one unit can match at a given position and the alternation
+        # can be factored into a prefix trie. A unit ending in a digit ("mm2",
+        # "m3", ...) can however lend that digit as the number of a unit that the
+        # original longest-first order tried before it ("5mm2 km2"), so when one
+        # appears in the text a new pass starts at each of them to keep that
+        # order; otherwise all units share one pass. The standalone symbol units
+        # ("m²", "km³") run after every numbered unit, at the end of the last pass.
+        sorted_units = [unit for unit, _ in sorted(self.units.items(), key=lambda x: len(x[0]), reverse=True)]
+        symbol_units = [unit for unit in sorted_units if any(c in unit for c in '²³°')]
+        digit_units = [unit for unit in sorted_units if re.match(r'\d', unit[-1])]
+        unit_groups = [[]]
+        for unit in sorted_units:
+            if unit_groups[-1] and unit in digit_units:
+                unit_groups.append([])
+            unit_groups[-1].append(unit)
+        
+        numbered_unit = rf'(?<!\d)(?P<unit_value>{atomic_number})\s*(?P<unit>{{}})\b'
+        symbol_unit = rf'\b(?P<symbol>{_trie_pattern(symbol_units)})\b'
+        self._digit_unit_re = re.compile('|'.join(map(re.escape, digit_units)), re.IGNORECASE)
+        self._unit_passes = []
+        for i, units in enumerate(unit_groups):
+            pattern = numbered_unit.format(_trie_pattern(units))
+            if i == len(unit_groups) - 1:
+                pattern += '|' + symbol_unit
+            self._unit_passes.append(re.compile(pattern, re.IGNORECASE))
+        self._fused_unit_passes = [
+            re.compile(numbered_unit.format(_trie_pattern(sorted_units)) + '|' + symbol_unit, re.IGNORECASE)
+        ]
+        self._unit_lookup = {unit.casefold(): full_name for unit, full_name in self.units.items()}
+        
+        self._time_hms_re = re.compile(r'(\d{1,2}):(\d{2}):(\d{2})')
+        self._time_hm_re = re.compile(r'(\d{1,2}):(\d{2})')
+        self._time_h_m_re = re.compile(r'(\d{1,2})h(\d{2})')
+        self._time_h_re = re.compile(r'(\d{1,2})h\b')
+        
+        self._date_prefixed_re = re.compile(r'\bngày\s+(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})\b')
+        self._date_prefixed_short_re = re.compile(r'\bngày\s+(\d{1,2})[/\-](\d{1,2})[/\-](\d{2})\b')
+        self._date_iso_re = re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b')
+        self._date_re = re.compile(r'\b(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})\b')
+        self._date_short_re = re.compile(r'\b(\d{1,2})[/\-](\d{1,2})[/\-](\d{2})\b')
+        
+        self._phone_intl_re = re.compile(r'(\+84|84)[\s\-\.]?\d[\d\s\-\.]{7,}')
+        self._phone_local_re = re.compile(r'\b0\d[\d\s\-\.]{8,}')
+        self._non_digit_re = re.compile(r'[^\d]')
+        
+        self._percent_sign_re = re.compile(r'(\d+(?:[,.]\d+)?)%')
+        self._thousands_re = re.compile(r'(\d{1,3})(?:\.(\d{3}))+')
+        self._decimal_comma_re = re.compile(r'(\d+),(\d+)')
+        self._decimal_dot_re = re.compile(r'(\d+)\.(\d{1,2})\b')
+        self._integer_re = re.compile(r'\b\d+\b')
+        
+        self._special_chars_table = str.maketrans({
+            '&': ' và ', '+': ' cộng ', '=': ' bằng ', '#': ' thăng ',
+            '[': ' ', ']': ' ', '(': ' ', ')': ' ', '{': ' ', '}': ' ',
+        })
+        self._dash_re = re.compile(r'\s+[-–—]+\s+')
+        self._ellipsis_re = re.compile(r'\.{2,}')
+        self._spaced_dot_re = re.compile(r'\s+\.\s+')
+        self._unsupported_chars_re = re.compile(
+            r'[^\w\sàáảãạăắằẳẵặâấầẩẫậèéẻẽẹêếềểễệìíỉĩịòóỏõọôốồổỗộơớờởỡợùúủũụưứừửữựỳýỷỹỵđ.,!?;:@%]'
+        )
+        self._whitespace_re = re.compile(r'\s+')
     
     def normalize(self, text):
         """Main normalization pipeline."""
@@ -62,38 +188,40 @@ class VietnameseTTSNormalizer:
     
     def _normalize_temperature(self, text):
         """Convert temperature notation to words."""
-        text = re.sub(r'-(\d+(?:[.,]\d+)?)\s*°\s*c\b', r'âm \1 độ xê', text, flags=re.IGNORECASE)
-        text = re.sub(r'-(\d+(?:[.,]\d+)?)\s*°\s*f\b', r'âm \1 độ ép', text, flags=re.IGNORECASE)
-        text = re.sub(r'(\d+(?:[.,]\d+)?)\s*°\s*c\b', r'\1 độ xê', text, flags=re.IGNORECASE)
-        text = re.sub(r'(\d+(?:[.,]\d+)?)\s*°\s*f\b', r'\1 độ ép', text, flags=re.IGNORECASE)
-        text = re.sub(r'°', ' độ ', text)
-        return text
+        def temperature_to_text(match):
+            if match.lastgroup == 'degree':
+                return ' độ '
+            sign = 'âm ' if match.group('temp_sign') else ''
+            scale = 'xê' if match.group('temp_scale').lower() == 'c' else 'ép'
+            return f"{sign}{match.group('temp_value')} độ {scale}"
+        
+        return self._temperature_re.sub(temperature_to_text, text)
     
     def _normalize_currency(self, text):
         """Convert currency notation to words."""
-        def decimal_currency(match):
-            whole = match.group(1)
-            decimal = match.group(2)
-            unit = match.group(3)
-            decimal_words = ' '.join([self.digits[int(d)] for d in decimal])
-            unit_map = {'k': 'nghìn', 'm': 'triệu', 'b': 'tỷ'}
-            unit_word = unit_map.get(unit.lower(), unit)
-            return f"{whole} phẩy {decimal_words} {unit_word}"
-        
-        text = re.sub(r'(\d+)[.,](\d+)\s*([kmb])\b', decimal_currency, text, flags=re.IGNORECASE)
-        text = re.sub(r'(\d+)\s*k\b', r'\1 nghìn', text, flags=re.IGNORECASE)
-        text = re.sub(r'(\d+)\s*m\b', r'\1 triệu', text, flags=re.IGNORECASE)
-        text = re.sub(r'(\d+)\s*b\b', r'\1 tỷ', text, flags=re.IGNORECASE)
-        text = re.sub(r'(\d+(?:[.,]\d+)?)\s*đ\b', r'\1 đồng', text)
-        text = re.sub(r'(\d+(?:[.,]\d+)?)\s*vnd\b', r'\1 đồng', text, flags=re.IGNORECASE)
-        text = re.sub(r'\$\s*(\d+(?:[.,]\d+)?)', r'\1 đô la', text)
-        text = re.sub(r'(\d+(?:[.,]\d+)?)\s*\$', r'\1 đô la', text)
+        unit_map = {'k': 'nghìn', 'm': 'triệu', 'b': 'tỷ'}
+        
+        def currency_to_text(match):
+            kind = match.lastgroup
+            if kind == 'decimal':
+                whole = match.group('dec_whole')
+                decimal = match.group('dec_frac')
+                unit = match.group('dec_unit')
+                decimal_words = ' '.join([self.digits[int(d)] for d in decimal])
+                unit_word = unit_map.get(unit.lower(), unit)
+                return f"{whole} phẩy {decimal_words} {unit_word}"
+            if kind == 'scaled':
+                return f"{match.group('scaled_value')} {unit_map[match.group('scaled_unit').lower()]}"
+            return f"{match.group(kind + '_value')} đồng"
+        
+        text = self._currency_re.sub(currency_to_text, text)
+        text = self._dollar_prefix_re.sub(r'\1 đô la', text)
+        text = self._dollar_suffix_re.sub(r'\1 đô la', text)
         return text
     
     def _normalize_percentage(self, text):
         """Convert percentage to words."""
-        text = re.sub(r'(\d+(?:[.,]\d+)?)\s*%', r'\1 phần trăm', text)
-        return text
+        return self._percentage_re.sub(r'\1 phần trăm', text)
     
     def _normalize_units(self, text):
         """Convert measurement units to words."""
@@ -112,23 +240,29 @@ class VietnameseTTSNormalizer:
             full_unit2 = self.units.get(unit2, unit2)
             return f"{full_unit1} trên {full_unit2}"
         
-        text = re.sub(r'(\d+(?:[.,]\d+)?)\s*([a-zA-Zμµ²³°]+)/([a-zA-Zμµ²³°0-9]+)\b', 
-                     expand_compound_with_number, text)
-        text = re.sub(r'\b([a-zA-Zμµ²³°]+)/([a-zA-Zμµ²³°0-9]+)\b', 
-                     expand_compound_without_number, text)
-        
-        sorted_units = sorted(self.units.items(), key=lambda x: len(x[0]), reverse=True)
-        for unit, full_name in sorted_units:
-            pattern = r'(\d+(?:[.,]\d+)?)\s*' + re.escape(unit) + r'\b'
-            text = re.sub(pattern, rf'\1 {full_name}', text, flags=re.IGNORECASE)
+        def expand_unit(match):
+            number = match.group('unit_value')
+            if number is None:
+                return self._unit_full_name(match.group('symbol'))
+            return f"{number} {self._unit_full_name(match.group('unit'))}"
         
-        for unit, full_name in sorted_units:
-            if any(c in unit for c in '²³°'):
-                pattern = r'\b' + re.escape(unit) + r'\b'
-                text = re.sub(pattern, full_name, text, flags=re.IGNORECASE)
+        text = self._compound_unit_number_re.sub(expand_compound_with_number, text)
+        text = self._compound_unit_re.sub(expand_compound_without_number, text)
+        unit_passes = self._unit_passes if self._digit_unit_re.search(text) else self._fused_unit_passes
+        for pattern in unit_passes:
+            text = pattern.sub(expand_unit, text)
         
         return text
     
+    def _unit_full_name(self, unit):
+        """Look up the spoken name of a unit matched case-insensitively."""
+        full_name = self._unit_lookup.get(unit.casefold())
+        if full_name is None:
+            # Case-insensitive matches that casefold() does not map back (e.g. "ı" for "i").
+            full_name = next(name for key, name in self.units.items()
+                             if re.fullmatch(re.escape(key), unit, re.IGNORECASE))
+        return full_name
+    
     def _normalize_time(self, text):
         """Convert time notation to words with validation."""
         
@@ -175,10 +309,10 @@ class VietnameseTTSNormalizer:
                 return f"{hour} giờ"
         
         # Apply patterns with validation
-        text = re.sub(r'(\d{1,2}):(\d{2}):(\d{2})', validate_and_convert_time, text)
-        text = re.sub(r'(\d{1,2}):(\d{2})', validate_and_convert_time, text)
-        text = re.sub(r'(\d{1,2})h(\d{2})', validate_and_convert_time, text)
-        text = re.sub(r'(\d{1,2})h\b', validate_and_convert_time, text)
+        text = self._time_hms_re.sub(validate_and_convert_time, text)
+        text = self._time_hm_re.sub(validate_and_convert_time, text)
+        text = self._time_h_m_re.sub(validate_and_convert_time, text)
+        text = self._time_h_re.sub(validate_and_convert_time, text)
         
         return text
     
@@ -217,13 +351,13 @@ class VietnameseTTSNormalizer:
             return match.group(0)
         
         # Apply patterns with validation
-        text = re.sub(r'\bngày\s+(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})\b', 
+        text = self._date_prefixed_re.sub(
                     lambda m: date_to_text(m).replace('ngày ngày', 'ngày'), text)
-        text = re.sub(r'\bngày\s+(\d{1,2})[/\-](\d{1,2})[/\-](\d{2})\b', 
+        text = self._date_prefixed_short_re.sub(
                     lambda m: date_short_year(m).replace('ngày ngày', 'ngày'), text)
-        text = re.sub(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b', date_iso_to_text, text)
-        text = re.sub(r'\b(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})\b', date_to_text, text)
-        text = re.sub(r'\b(\d{1,2})[/\-](\d{1,2})[/\-](\d{2})\b', date_short_year, text)
+        text = self._date_iso_re.sub(date_iso_to_text, text)
+        text = self._date_re.sub(date_to_text, text)
+        text = self._date_short_re.sub(date_short_year, text)
         
         return text
     
@@ -231,7 +365,7 @@ class VietnameseTTSNormalizer:
         """Convert phone numbers to digit-by-digit reading."""
         def phone_to_text(match):
             phone = match.group(0)
-            phone = re.sub(r'[^\d]', '', phone)
+            phone = self._non_digit_re.sub('', phone)
             
             if phone.startswith('84') and len(phone) >= 10:
                 phone = '0' + phone[2:]
@@ -242,14 +376,14 @@ class VietnameseTTSNormalizer:
             
             return match.group(0)
         
-        text = re.sub(r'(\+84|84)[\s\-\.]?\d[\d\s\-\.]{7,}', phone_to_text, text)
-        text = re.sub(r'\b0\d[\d\s\-\.]{8,}', phone_to_text, text)
+        text = self._phone_intl_re.sub(phone_to_text, text)
+        text = self._phone_local_re.sub(phone_to_text, text)
         return text
     
     def _normalize_numbers(self, text):
-        text = re.sub(r'(\d+(?:[,.]\d+)?)%', lambda m: f'{m.group(1)} phần trăm', text)
+        text = self._percent_sign_re.sub(lambda m: f'{m.group(1)} phần trăm', text)
         # 1. Xóa dấu thousand separator trước
-        text = re.sub(r'(\d{1,3})(?:\.(\d{3}))+', lambda m: m.group(0).replace('.', ''), text)
+        text = self._thousands_re.sub(lambda m: m.group(0).replace('.', ''), text)
     
         # 2. Chuyển số thập phân thành chữ
         def decimal_to_words(match):
@@ -260,9 +394,9 @@ class VietnameseTTSNormalizer:
             return f"{whole} {separator} {decimal_words}"
         
         # 2a. Dấu phẩy
-        text = re.sub(r'(\d+),(\d+)', decimal_to_words, text)
+        text = self._decimal_comma_re.sub(decimal_to_words, text)
         # 2b. Dấu chấm (1-2 chữ số thập phân)
-        text = re.sub(r'(\d+)\.(\d{1,2})\b', decimal_to_words, text)
+        text = self._decimal_dot_re.sub(decimal_to_words, text)
         
         return text
     
@@ -350,25 +484,21 @@ class VietnameseTTSNormalizer:
             num = int(match.group(0))
             return self._convert_number_to_words(num)
         
-        text = re.sub(r'\b\d+\b', convert_number, text)
+        text = self._integer_re.sub(convert_number, text)
         return text
     
     def _normalize_special_chars(self, text):
         """Handle special characters."""
-        text = text.replace('&', ' và ')
-        text = text.replace('+', ' cộng ')
-        text = text.replace('=', ' bằng ')
-        text = text.replace('#', ' thăng ')
-        text = re.sub(r'[\[\]\(\)\{\}]', ' ', text)
-        text = re.sub(r'\s+[-–—]+\s+', ' ', text)
-        text = re.sub(r'\.{2,}', ' ', text)
-        text = re.sub(r'\s+\.\s+', ' ', text)
-        text = re.sub(r'[^\w\sàáảãạăắằẳẵặâấầẩẫậèéẻẽẹêếềểễệìíỉĩịòóỏõọôốồổỗộơớờởỡợùúủũụưứừửữựỳýỷỹỵđ.,!?;:@%]', ' ', text)
+        text = text.translate(self._special_chars_table)
+        text = self._dash_re.sub(' ', text)
+        text = self._ellipsis_re.sub(' ', text)
+        text = self._spaced_dot_re.sub(' ', text)
+        text = self._unsupported_chars_re.sub(' ', text)
         return text
     
     def _normalize_whitespace(self, text):
         """Normalize whitespace."""
-        text = re.sub(r'\s+', ' ', text)
+        text = self._whitespace_re.sub(' ', text)
         text = text.strip()
         return text
 
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import threading
+
+# Bumped when stored entries from older versions must not be trusted (see _migrate)
+SCHEMA_VERSION = 1
+
+
+class LearnedPhonemeStore:
+    """
+    Append-only on-disk store for phonemes learned from espeak.
+
+    Backed by SQLite in WAL mode, so several worker processes can read and
+    append to the same file concurrently. The connection is opened lazily on
+    first use and reopened after a fork. A store written by an older version
+    is cleared on first open if its entries may be wrong. Failures to open or
+    write the store are reported once and then ignored: phonemization keeps
+    working from memory only.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._conn = None
+        self._pid = None
+        self._disabled = not path
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        # A connection inherited through fork must not be reused by the child
+        self._conn = None
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS learned_phonemes ("
+            "word TEXT PRIMARY KEY, phonemes TEXT NOT NULL)"
+        )
+        conn.commit()
+        self._migrate(conn)
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        """Bring a store written by an older version up to SCHEMA_VERSION."""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Checked again under the write lock: another process may have migrated meanwhile
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                # Version 0 could store phonemes shifted onto the wrong words by a misaligned batch
+                conn.execute("DELETE FROM learned_phonemes")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def _run(self, action, default):
+        if self._disabled:
+            return default
+        with self._lock:
+            try:
+                return action(self._connect())
+            except sqlite3.Error as e:
+                print(f"Warning: Learned phoneme store at {self.path} disabled: {e}")
+                self._disabled = True
+                return default
+
+    def load_all(self) -> dict[str, str]:
+        """Return every learned word, e.g. to warm up the in-memory dictionary."""
+        return self._run(
+            lambda conn: dict(conn.execute("SELECT word, phonemes FROM learned_phonemes")),
+            {}
+        )
+
+    def lookup(self, words: list[str]) -> dict[str, str]:
+        """Return the learned phonemes for those of words that are in the store."""
+        def query(conn):
+            found = {}
+            # Stay under SQLite's limit on bound parameters
+            for i in range(0, len(words), 500):
+                batch = words[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(conn.execute(
+                    f"SELECT word, phonemes FROM learned_phonemes WHERE word IN ({placeholders})",
+                    batch
+                ))
+            return found
+
+        if not words:
+            return {}
+        return self._run(query, {})
+
+    def add(self, entries: dict[str, str]):
+        """Append newly learned words; words already stored by any process are kept as is."""
+        def insert(conn):
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO learned_phonemes (word, phonemes) VALUES (?, ?)",
+                    entries.items()
+                )
+
+        if entries:
+            self._run(insert, None)
@@ -2,15 +2,107 @@ import os
 import json
 import platform
 import glob
+import threading
+from collections import OrderedDict
 from phonemizer import phonemize
 from phonemizer.backend.espeak.espeak import EspeakWrapper
 from utils.normalize_text import VietnameseTTSNormalizer
+from utils.phoneme_store import LearnedPhonemeStore
+from utils.compact_phoneme_dict import open_compact_phoneme_dict
 
 # Configuration
 PHONEME_DICT_PATH = os.getenv(
     'PHONEME_DICT_PATH',
     os.path.join(os.path.dirname(__file__), "phoneme_dict.json")
 )
+# Words learned from espeak, persisted across restarts and shared by workers.
+# Set LEARNED_PHONEMES_PATH to an empty string to keep them in memory only.
+LEARNED_PHONEMES_PATH = os.getenv(
+    'LEARNED_PHONEMES_PATH',
+    os.path.join(os.path.dirname(PHONEME_DICT_PATH), "phoneme_learned.db")
+)
+# Number of normalized sentences whose phonemes are kept in memory (0 disables)
+PHONEME_CACHE_SIZE = int(os.getenv('PHONEME_CACHE_SIZE', '1024'))
+
+class PhonemeCache:
+    """
+    Thread-safe LRU cache of normalized text -> phoneme string, with hit/miss counters.
+
+    Raw input texts are remembered as aliases of their normalized form, so a
+    repeated input skips normalization too, while differently written inputs
+    that normalize the same still share one entry.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._aliases = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+        while len(self._aliases) > max(self.maxsize, 0):
+            self._aliases.popitem(last=False)
+
+    def get_raw(self, text: str):
+        """Return the phonemes for a raw text seen before, without counting a miss."""
+        with self._lock:
+            normalized = self._aliases.get(text)
+            phones = self._entries.get(normalized) if normalized is not None else None
+            if phones is not None:
+                self.hits += 1
+                self._aliases.move_to_end(text)
+                self._entries.move_to_end(normalized)
+            return phones
+
+    def get(self, normalized: str):
+        with self._lock:
+            phones = self._entries.get(normalized)
+            if phones is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(normalized)
+            return phones
+
+    def put(self, normalized: str, phones: str, text: str = None):
+        """Store phones for normalized text, and remember text as an alias of it."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[normalized] = phones
+            self._entries.move_to_end(normalized)
+            if text is not None:
+                self._aliases[text] = normalized
+                self._aliases.move_to_end(text)
+            self._evict()
+
+    def resize(self, maxsize: int):
+        """Change the capacity, evicting the least recently used entries if needed."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+phoneme_cache = PhonemeCache(PHONEME_CACHE_SIZE)
 
 def load_phoneme_dict(path=PHONEME_DICT_PATH):
     """Load phoneme dictionary from JSON file."""
@@ -23,6 +115,17 @@ def load_phoneme_dict(path=PHONEME_DICT_PATH):
             "Please create it or set PHONEME_DICT_PATH environment variable."
         )
 
+def load_compact_phoneme_dict(path=PHONEME_DICT_PATH):
+    """
+    Memory-map the compiled phoneme dictionary (utils/compact_phoneme_dict.py),
+    building it from the JSON file if needed. Falls back to the JSON file.
+    """
+    try:
+        return open_compact_phoneme_dict(path)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Compact phoneme dictionary unavailable ({e}), loading {path}")
+        return load_phoneme_dict(path)
+
 def setup_espeak_library():
     """Configure eSpeak library path based on operating system."""
     system = platform.system()
@@ -96,18 +199,59 @@ def _setup_macos_espeak():
         "Or set: export PHONEMIZER_ESPEAK_LIBRARY=/path/to/libespeak-ng.dylib"
     )
 
-# Initialize
-try:
-    setup_espeak_library()
-    phoneme_dict = load_phoneme_dict()
-    normalizer = VietnameseTTSNormalizer()
-except Exception as e:
-    print(f"Initialization error: {e}")
-    raise
+learned_store = LearnedPhonemeStore(LEARNED_PHONEMES_PATH)
+
+# Initialized on first use (or by warmup()), not at import time
+_phoneme_dict = None
+_normalizer = None
+_init_lock = threading.Lock()
+
+def _initialize():
+    """Set up eSpeak and load the phoneme dictionary and normalizer, once per process."""
+    global _phoneme_dict, _normalizer
+    if _normalizer is not None:
+        return
+    with _init_lock:
+        if _normalizer is not None:
+            return
+        try:
+            setup_espeak_library()
+            phoneme_dict = load_compact_phoneme_dict()
+            normalizer = VietnameseTTSNormalizer()
+        except Exception as e:
+            print(f"Initialization error: {e}")
+            raise
+        for word, phone_word in learned_store.load_all().items():
+            phoneme_dict.setdefault(word, phone_word)
+        _phoneme_dict = phoneme_dict
+        # Published last: other threads only skip the lock once everything is ready
+        _normalizer = normalizer
+
+def warmup():
+    """Initialize eSpeak, the phoneme dictionary and the normalizer now instead of on first use."""
+    _initialize()
+
+def get_phoneme_dict():
+    """Return the shared phoneme dictionary, loading it on first use."""
+    _initialize()
+    return _phoneme_dict
+
+def get_normalizer() -> VietnameseTTSNormalizer:
+    """Return the shared text normalizer, creating it on first use."""
+    _initialize()
+    return _normalizer
+
+def __getattr__(name):
+    # Keep `phonemize_text.phoneme_dict` / `.normalizer` working without eager loading
+    if name == "phoneme_dict":
+        return get_phoneme_dict()
+    if name == "normalizer":
+        return get_normalizer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def phonemize_text(text: str) -> str:
     """Convert text to phonemes using phonemizer."""
-    text = normalizer.normalize(text)
+    text = get_normalizer().normalize(text)
     return phonemize(
         text,
         language="vi",
@@ -117,34 +261,112 @@ def phonemize_text(text: str) -> str:
         language_switch="remove-flags"
     )
 
-def phonemize_with_dict(text: str, phoneme_dict=phoneme_dict) -> str:
-    """Phonemize text with dictionary lookup."""
-    text = normalizer.normalize(text)
-    words = text.split()
-    result = []
-    
-    for word in words:
-        if word in phoneme_dict:
-            phone_word = phoneme_dict[word]
-        else:
+def _phonemize_words(words: list[str]) -> dict[str, str]:
+    """
+    Phonemize out-of-dictionary words with a single espeak call.
+
+    Punctuation-only words are phonemized one by one: phonemizer merges
+    consecutive ones into a single output, which would shift every result
+    after them. Falls back to one call per word if the batched call fails or
+    returns a result count that does not match, so a single bad word only
+    costs itself. Words that cannot be phonemized are left out of the result.
+    """
+    options = dict(
+        language='vi',
+        backend='espeak',
+        preserve_punctuation=True,
+        with_stress=True,
+        language_switch='remove-flags'
+    )
+
+    def phonemize_one_by_one(words):
+        phones = []
+        for word in words:
             try:
-                phone_word = phonemize(
-                    word,
-                    language='vi',
-                    backend='espeak',
-                    preserve_punctuation=True,
-                    with_stress=True,
-                    language_switch='remove-flags'
-                )
-                
-                if word.lower().startswith('r'):
-                    phone_word = 'ɹ' + phone_word[1:]
-                
-                phoneme_dict[word] = phone_word
+                phones.append(phonemize(word, **options))
             except Exception as e:
                 print(f"Warning: Could not phonemize '{word}': {e}")
-                phone_word = word
-        
-        result.append(phone_word)
-    
-    return ' '.join(result)
\ No newline at end of file
+                phones.append(None)
+        return phones
+
+    batch = [word for word in words if any(c.isalnum() for c in word)]
+    singles = [word for word in words if not any(c.isalnum() for c in word)]
+    phones_by_word = dict(zip(singles, phonemize_one_by_one(singles)))
+    if batch:
+        try:
+            phones = phonemize(batch, **options)
+            if len(phones) != len(batch):
+                raise ValueError(f"got {len(phones)} results for {len(batch)} words")
+        except Exception as e:
+            print(f"Warning: Batch phonemization failed, retrying word by word: {e}")
+            phones = phonemize_one_by_one(batch)
+        phones_by_word.update(zip(batch, phones))
+
+    learned = {}
+    for word in words:
+        phone_word = phones_by_word[word]
+        if phone_word is None:
+            continue
+        if word.lower().startswith('r'):
+            phone_word = 'ɹ' + phone_word[1:]
+        learned[word] = phone_word
+    return learned
+
+def phonemize_batch_with_dict(texts: list[str], phoneme_dict=None) -> list[str]:
+    """
+    Phonemize several texts with dictionary lookup.
+
+    Results for the shared dictionary are cached per normalized text in
+    phoneme_cache. Out-of-dictionary words are first looked up in the learned
+    phoneme store; the rest, from all texts, are phonemized together in one
+    espeak call and added to both phoneme_dict and the store. phoneme_dict
+    defaults to the shared dictionary, which already includes the store's words.
+    """
+    normalizer = get_normalizer()
+    use_cache = phoneme_dict is None
+    if use_cache:
+        phoneme_dict = get_phoneme_dict()
+
+    results = [phoneme_cache.get_raw(text) if use_cache else None for text in texts]
+    normalized_texts = [
+        normalizer.normalize(text) if phones is None else None
+        for text, phones in zip(texts, results)
+    ]
+    for i, normalized in enumerate(normalized_texts):
+        if normalized is not None and use_cache:
+            results[i] = phoneme_cache.get(normalized)
+            if results[i] is not None:
+                phoneme_cache.put(normalized, results[i], texts[i])
+    pending = [i for i, phones in enumerate(results) if phones is None]
+    if not pending:
+        return results
+
+    texts_words = {i: normalized_texts[i].split() for i in pending}
+    oov_words = list(dict.fromkeys(
+        word for words in texts_words.values() for word in words if word not in phoneme_dict
+    ))
+    if oov_words:
+        # Also picks up words learned by other workers since initialization
+        phoneme_dict.update(learned_store.lookup(oov_words))
+        oov_words = [word for word in oov_words if word not in phoneme_dict]
+
+    if oov_words:
+        # Only results matched to their own word: the store keeps entries across restarts
+        learned = _phonemize_words(oov_words)
+        phoneme_dict.update(learned)
+        learned_store.add(learned)
+
+    for i, words in texts_words.items():
+        results[i] = ' '.join(phoneme_dict.get(word, word) for word in words)
+        # Words espeak could not handle are retried next time rather than cached as is
+        if use_cache and all(word in phoneme_dict for word in words):
+            phoneme_cache.put(normalized_texts[i], results[i], texts[i])
+    return results
+
+def phonemize_with_dict(text: str, phoneme_dict=None) -> str:
+    """Phonemize text with dictionary lookup."""
+    return phonemize_batch_with_dict([text], phoneme_dict)[0]
+
+def phoneme_cache_info() -> dict:
+    """Hit/miss counters and size of the sentence-level phoneme cache."""
+    return phoneme_cache.info()
@@ -0,0 +1,102 @@
+"""
+Routing of synthesis requests across several engines.
+
+An engine is one model with its own BatchScheduler, so engines synthesize
+in parallel: e.g. a q4 GGUF model on CPU cores next to a Transformers or
+LMDeploy model on the GPU. Each request is classed as realtime or bulk
+(explicitly, or by its text length) and sent to the least loaded engine
+serving that class, load being the chunks queued or running on it.
+Realtime requests overflow to any less loaded engine once their own
+engines are backed up; bulk requests never take a realtime-only engine.
+Within an engine, realtime chunks are scheduled before bulk ones.
+"""
+import threading
+
+LATENCY_CLASSES = ("realtime", "bulk")
+# Scheduler priority of each latency class
+LATENCY_PRIORITY = {"realtime": 1, "bulk": 0}
+
+
+def classify_request(text_chars: int, latency_class: str = None, short_text_chars: int = 300) -> str:
+    """The latency class of a request: as given, else realtime for short texts and bulk for long ones."""
+    if latency_class is not None:
+        if latency_class not in LATENCY_CLASSES:
+            raise ValueError(f"Invalid latency class: {latency_class}. Choose from {', '.join(LATENCY_CLASSES)}")
+        return latency_class
+    return "realtime" if text_chars <= short_text_chars else "bulk"
+
+
+class Engine:
+    """A model (by model ID), the scheduler running its jobs and the latency classes it serves."""
+
+    def __init__(self, name: str, model: str, scheduler, classes=LATENCY_CLASSES, lmdeploy: bool = False,
+                 workers: int = 1):
+        for latency_class in classes:
+            if latency_class not in LATENCY_CLASSES:
+                raise ValueError(f"Invalid latency class for engine {name}: {latency_class}")
+        self.name = name
+        self.model = model
+        self.scheduler = scheduler
+        self.classes = tuple(classes)
+        # Whether the model may load with LMDeploy (on a CUDA device, if installed)
+        self.lmdeploy = lmdeploy
+        # CPU worker processes of a GGUF model (see GGUFWorkerPool); 1 = a single in-process model
+        self.workers = workers
+        self.routed = {latency_class: 0 for latency_class in LATENCY_CLASSES}
+
+    def info(self) -> dict:
+        return {
+            'name': self.name,
+            'model': self.model,
+            'classes': list(self.classes),
+            'lmdeploy': self.lmdeploy,
+            'workers': self.workers,
+            'pending_jobs': self.scheduler.pending(),
+            'routed': dict(self.routed),
+            'scheduler': self.scheduler.stats(),
+        }
+
+
+class EngineRouter:
+    """
+    Picks the engine for each request.
+
+    Engines are tried in the given order when equally loaded. Once the
+    least loaded engine of a realtime request has max_pending chunks or
+    more, the least loaded of all engines is used if it has fewer. Every
+    latency class must be served by at least one engine.
+    """
+
+    def __init__(self, engines: list[Engine], short_text_chars: int = 300, max_pending: int = 8):
+        if not engines:
+            raise ValueError("EngineRouter needs at least one engine")
+        for latency_class in LATENCY_CLASSES:
+            if not any(latency_class in engine.classes for engine in engines):
+                raise ValueError(f"No engine serves the {latency_class} latency class")
+        self.engines = list(engines)
+        self.short_text_chars = short_text_chars
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+
+    def classify(self, text_chars: int, latency_class: str = None) -> str:
+        return classify_request(text_chars, latency_class, self.short_text_chars)
+
+    def route(self, text_chars: int, latency_class: str = None) -> tuple[Engine, str]:
+        """The engine for a request with text_chars characters, and the request's latency class."""
+        latency_class = self.classify(text_chars, latency_class)
+        candidates = [engine for engine in self.engines if latency_class in engine.classes]
+        engine = min(candidates, key=lambda engine: engine.scheduler.pending())
+        if latency_class == "realtime" and engine.scheduler.pending() >= self.max_pending:
+            spare = min(self.engines, key=lambda engine: engine.scheduler.pending())
+            if spare.scheduler.pending() < engine.scheduler.pending():
+                engine = spare
+        with self._lock:
+            engine.routed[latency_class] += 1
+        return engine, latency_class
+
+    def stats(self) -> dict:
+        return {
+            'short_text_chars': self.short_text_chars,
+            'max_pending': self.max_pending,
+            'engines': [engine.info() for engine in self.engines],
+        }
@@ -1,4 +1,4 @@
 from .vieneu_tts import VieNeuTTS, FastVieNeuTTS
+from .worker_pool import GGUFWorkerPool
 
-__all__ = ["VieNeuTTS", "FastVieNeuTTS"]
-
+__all__ = ["VieNeuTTS", "FastVieNeuTTS", "GGUFWorkerPool"]
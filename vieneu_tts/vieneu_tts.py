@@ -4,11 +4,15 @@ import librosa
 import numpy as np
 import torch
 from neucodec import NeuCodec, DistillNeuCodec
-from utils.phonemize_text import phonemize_with_dict
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from utils.phonemize_text import phonemize_batch_with_dict, phonemize_with_dict, phoneme_cache_info, warmup as warmup_phonemizer
+from collections import defaultdict, OrderedDict
+import copy
+import ctypes
+import dataclasses
 import re
 import gc
+import queue
+import threading
 
 # ============================================================================
 # Shared Utilities
@@ -41,6 +45,408 @@ def _linear_overlap_add(frames: list[np.ndarray], stride: int) -> np.ndarray:
     return out / sum_weight
 
 
+class _StreamingOverlapAdd:
+    """
+    Incremental version of _linear_overlap_add for streaming.
+
+    Frames are added one at a time at offsets of `stride`; each call returns
+    only the samples no later frame can change. Only the overlapping tail is
+    kept between calls, in preallocated buffers, so every chunk costs the same
+    however long the stream is. Concatenating the outputs of add() and flush()
+    gives exactly _linear_overlap_add(frames, stride).
+    """
+
+    def __init__(self, stride: int):
+        self.stride = stride
+        self._out = None
+        self._sum_weight = None
+        self._pending = 0  # valid samples in the buffers
+        self._weights = {}
+
+    def _weight(self, frame_length: int, dtype) -> np.ndarray:
+        key = (frame_length, np.dtype(dtype))
+        if key not in self._weights:
+            t = np.linspace(0, 1, frame_length + 2, dtype=dtype)[1:-1]
+            self._weights[key] = np.abs(0.5 - (t - 0.5))
+        return self._weights[key]
+
+    def _reserve(self, frame: np.ndarray):
+        size = max(frame.shape[-1], self._pending)
+        if self._out is not None and self._out.shape[-1] >= size:
+            return
+        out = np.zeros((*frame.shape[:-1], size), dtype=frame.dtype)
+        sum_weight = np.zeros(size, dtype=frame.dtype)
+        if self._out is not None:
+            out[..., : self._pending] = self._out[..., : self._pending]
+            sum_weight[: self._pending] = self._sum_weight[: self._pending]
+        self._out, self._sum_weight = out, sum_weight
+
+    def _take(self, n: int) -> np.ndarray:
+        """Normalize and return the first n pending samples, shifting the rest forward."""
+        result = self._out[..., :n] / self._sum_weight[:n]
+        rest = self._pending - n
+        self._out[..., :rest] = self._out[..., n : self._pending]
+        self._sum_weight[:rest] = self._sum_weight[n : self._pending]
+        self._out[..., rest : self._pending] = 0
+        self._sum_weight[rest : self._pending] = 0
+        self._pending = rest
+        return result
+
+    def add(self, frame: np.ndarray) -> np.ndarray:
+        """Add the next frame and return the samples finalized by it."""
+        self._reserve(frame)
+        frame_length = frame.shape[-1]
+        weight = self._weight(frame_length, frame.dtype)
+        self._out[..., :frame_length] += weight * frame
+        self._sum_weight[:frame_length] += weight
+        self._pending = max(self._pending, frame_length)
+        return self._take(min(self.stride, self._pending))
+
+    def flush(self) -> np.ndarray:
+        """Return the remaining samples after the last frame."""
+        if self._out is None:
+            return np.zeros(0, dtype=np.float32)
+        return self._take(self._pending)
+
+
+_SPEECH_TOKEN_RE = re.compile(r"<\|speech_(\d+)\|>")
+
+
+def _build_speech_code_lut(vocab: dict[str, int]) -> np.ndarray:
+    """
+    Build a lookup table from vocabulary ID to codec code.
+
+    lut[token_id] is N for the token <|speech_N|> and -1 for every other token.
+    The last entry is always -1, for IDs past the vocabulary.
+    """
+    lut = np.full(max(vocab.values()) + 2, -1, dtype=np.int32)
+    for token, token_id in vocab.items():
+        if token.startswith("<|speech_"):
+            match = _SPEECH_TOKEN_RE.fullmatch(token)
+            if match:
+                lut[token_id] = int(match.group(1))
+    return lut
+
+
+def _speech_codes_from_token_ids(token_ids, lut: np.ndarray) -> np.ndarray:
+    """Map generated token IDs to codec codes, dropping non-speech tokens"""
+    # IDs past the tokenizer vocabulary (padded embedding rows) clip to the final -1
+    codes = lut.take(np.asarray(token_ids, dtype=np.int64), mode="clip")
+    return codes[codes >= 0]
+
+
+def _speech_codes_from_text(text: str) -> np.ndarray:
+    """Extract codec codes from text containing <|speech_N|> tokens"""
+    return np.array(_SPEECH_TOKEN_RE.findall(text), dtype=np.int32)
+
+
+def _consume_speech_text(text: str, codes: list[int]) -> str:
+    """
+    Append the codes of the complete <|speech_N|> tokens in streamed text to codes.
+
+    Returns the unparsed tail (a token split across stream items) to prepend
+    to the next piece of text.
+    """
+    end = 0
+    for match in _SPEECH_TOKEN_RE.finditer(text):
+        codes.append(int(match.group(1)))
+        end = match.end()
+    tail_start = text.find("<", end)
+    return text[tail_start:] if tail_start >= 0 else ""
+
+
+class _SpeechCodeBuffer:
+    """
+    Codec codes of a streamed generation, in a preallocated int32 array.
+
+    New tokens are appended as they arrive (as token IDs or as text), so each
+    step costs O(new tokens) regardless of how much was generated before.
+    """
+
+    def __init__(self, initial_codes, capacity: int = 0):
+        initial_codes = np.asarray(initial_codes, dtype=np.int32)
+        self._codes = np.empty(max(capacity, len(initial_codes), 64), dtype=np.int32)
+        self._codes[: len(initial_codes)] = initial_codes
+        self._size = len(initial_codes)
+        self._pending_text = ""
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return self._codes[: self._size][index]
+
+    def extend(self, codes):
+        codes = np.asarray(codes, dtype=np.int32)
+        end = self._size + len(codes)
+        if end > len(self._codes):
+            grown = np.empty(max(end, 2 * len(self._codes)), dtype=np.int32)
+            grown[: self._size] = self._codes[: self._size]
+            self._codes = grown
+        self._codes[self._size : end] = codes
+        self._size = end
+
+    def extend_token_ids(self, token_ids, lut: np.ndarray):
+        """Append newly generated token IDs, keeping only speech tokens"""
+        self.extend(_speech_codes_from_token_ids(token_ids, lut))
+
+    def extend_text(self, text: str):
+        """Append newly generated text; a token split across calls is completed by the next one"""
+        codes = []
+        self._pending_text = _consume_speech_text(self._pending_text + text, codes)
+        self.extend(codes)
+
+
+class _TokenIdStreamer:
+    """
+    Streamer for transformers' generate() that hands new token IDs to another thread.
+
+    Iterating it yields an array of token IDs per generation step until
+    generation ends; an exception raised by generate() is re-raised.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._prompt_skipped = False
+
+    def put(self, value):
+        # generate() first passes the prompt itself
+        if not self._prompt_skipped:
+            self._prompt_skipped = True
+            return
+        self._queue.put(value.detach().cpu().numpy().reshape(-1))
+
+    def end(self):
+        self._queue.put(None)
+
+    def fail(self, error: BaseException):
+        self._queue.put(error)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+class _SeededSampler:
+    """
+    Logits processor that samples each row with its own seeded generator.
+
+    Every row starts from the same seed and draws exactly one sample per step,
+    so a row's tokens depend only on its own prompt and the settings, not on
+    the other prompts in the batch. The sampled token is the only one left
+    unmasked, so generate() must run with greedy search (do_sample=False).
+    """
+
+    def __init__(self, seed: int, temperature: float = 1.0, top_k: int = 50, top_p: float = None):
+        self.seed = seed
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self._generators = None
+
+    def __call__(self, input_ids, scores):
+        if self._generators is None:
+            self._generators = [
+                torch.Generator(device=scores.device).manual_seed(self.seed) for _ in range(scores.shape[0])
+            ]
+        logits = scores.float() / self.temperature
+        if self.top_k:
+            kth = torch.topk(logits, min(self.top_k, logits.shape[-1])).values[:, -1:]
+            logits = logits.masked_fill(logits < kth, float("-inf"))
+        if self.top_p is not None and self.top_p < 1.0:
+            sorted_logits, sorted_idx = torch.sort(logits, descending=True)
+            sorted_probs = torch.softmax(sorted_logits, dim=-1)
+            # Keep the smallest set of tokens whose probability reaches top_p
+            drop = sorted_probs.cumsum(dim=-1) - sorted_probs > self.top_p
+            logits = logits.masked_fill(drop.scatter(1, sorted_idx, drop), float("-inf"))
+        probs = torch.softmax(logits, dim=-1)
+        chosen = torch.stack([
+            torch.multinomial(row, 1, generator=generator) for row, generator in zip(probs, self._generators)
+        ])
+        return torch.full_like(scores, float("-inf")).scatter(1, chosen, 0.0)
+
+
+def _pad_speech_codes(codes_list: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Stack codec code sequences of different lengths into one [B, 1, T] batch.
+
+    Shorter sequences are padded by repeating their last code: the codec
+    decoder attends over the whole sequence without a mask, and a held code
+    disturbs the real frames less than an arbitrary one. Returns the batch
+    and the length of each sequence.
+    """
+    lengths = np.array([len(codes) for codes in codes_list])
+    batch = np.empty((len(codes_list), 1, lengths.max()), dtype=np.int32)
+    for row, codes, length in zip(batch, codes_list, lengths):
+        row[0, :length] = codes
+        row[0, length:] = codes[-1]
+    return batch, lengths
+
+
+def _decode_speech_batch(codec, codes_list: list[str | np.ndarray], hop_length: int, is_onnx_codec: bool) -> list[np.ndarray]:
+    """
+    Decode several outputs (response texts or codec code arrays) with a single codec call.
+
+    The code sequences are padded to the longest one, decoded together as one
+    [B, 1, T] batch, and each waveform is trimmed back to its own length
+    (hop_length samples per code).
+    """
+    speech_ids_list = [
+        _speech_codes_from_text(codes) if isinstance(codes, str) else np.asarray(codes, dtype=np.int32)
+        for codes in codes_list
+    ]
+    if any(len(speech_ids) == 0 for speech_ids in speech_ids_list):
+        raise ValueError("No valid speech tokens found in output")
+
+    codes, lengths = _pad_speech_codes(speech_ids_list)
+    if is_onnx_codec:
+        recon = codec.decode_code(codes)
+    else:
+        with torch.no_grad():
+            codes = torch.from_numpy(codes.astype(np.int64)).to(codec.device)
+            recon = codec.decode_code(codes).cpu().numpy()
+
+    return [recon[i, 0, :length * hop_length] for i, length in enumerate(lengths)]
+
+
+def _codes_to_list(ref_codes) -> list[int]:
+    """Convert reference codes (tensor, array or list) to a flat list of ints"""
+    if isinstance(ref_codes, torch.Tensor):
+        ref_codes = ref_codes.cpu().numpy()
+    if isinstance(ref_codes, np.ndarray):
+        ref_codes = ref_codes.flatten().tolist()
+    return list(ref_codes)
+
+
+class VoicePrompt:
+    """
+    The voice-dependent part of a TTS prompt, computed once per reference voice.
+
+    Holds the phonemized reference text and the reference codes as prompt
+    text and, for backends that take token IDs, as ready-made token IDs
+    around the slot for the input text. A request then only phonemizes and
+    tokenizes its own text.
+    """
+
+    PROMPT_HEAD = "user: Convert the text to speech:<|TEXT_PROMPT_START|>"
+    PROMPT_TAIL = "<|TEXT_PROMPT_END|>\nassistant:<|SPEECH_GENERATION_START|>"
+
+    def __init__(self, ref_codes: list[int], ref_text: str, ref_text_phones: str):
+        self.ref_codes = ref_codes
+        self.ref_text = ref_text
+        self.ref_text_phones = ref_text_phones
+        self.codes_str = "".join([f"<|speech_{idx}|>" for idx in ref_codes])
+        self.prompt_prefix = f"{self.PROMPT_HEAD}{ref_text_phones} "
+        self.prompt_suffix = f"{self.PROMPT_TAIL}{self.codes_str}"
+
+        # Set by tokenize()
+        self._encode = None
+        self.head_ids = None
+        self.prefix_ids = None
+        self.suffix_ids = None
+        self._can_splice = False
+
+        # llama-cpp KV state after evaluating prefix_ids (GGUF models, see VieNeuTTS._restore_voice_state)
+        self.llama_state = None
+
+    def tokenize(self, encode, head_ids: list[int], tail_ids: list[int]):
+        """
+        Precompute token IDs.
+
+        Args:
+            encode: Tokenizes a text fragment (without BOS), parsing special tokens
+            head_ids: Template tokens up to and including <|TEXT_PROMPT_START|>
+            tail_ids: Template tokens from <|TEXT_PROMPT_END|> to <|SPEECH_GENERATION_START|>
+        """
+        self._encode = encode
+        self.head_ids = list(head_ids)
+        self.prefix_ids = self.head_ids + list(encode(self.ref_text_phones))
+        self.suffix_ids = list(tail_ids) + list(encode(self.codes_str))
+        # Input tokens are appended to the cached reference tokens only if the
+        # tokenizer does not merge across the space between the two texts
+        probe = self.ref_text_phones
+        self._can_splice = (
+            list(encode(f"{self.ref_text_phones} {probe}"))
+            == self.prefix_ids[len(self.head_ids):] + list(encode(f" {probe}"))
+        )
+        return self
+
+    def prompt(self, input_text_phones: str) -> str:
+        """Full prompt text for an already phonemized input text."""
+        return f"{self.prompt_prefix}{input_text_phones}{self.prompt_suffix}"
+
+    def prompt_ids(self, input_text_phones: str) -> list[int]:
+        """Full prompt token IDs for an already phonemized input text (requires tokenize())."""
+        if self._can_splice:
+            return self.prefix_ids + list(self._encode(f" {input_text_phones}")) + self.suffix_ids
+        text_ids = self._encode(f"{self.ref_text_phones} {input_text_phones}")
+        return self.head_ids + list(text_ids) + self.suffix_ids
+
+
+class _VoicePromptCache:
+    """Small thread-safe LRU of VoicePrompt keyed by (ref_text, ref_codes)."""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._prompts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, ref_codes, ref_text: str, build) -> VoicePrompt:
+        ref_codes = _codes_to_list(ref_codes)
+        key = (ref_text, tuple(ref_codes))
+        with self._lock:
+            voice = self._prompts.get(key)
+            if voice is not None:
+                self._prompts.move_to_end(key)
+                return voice
+
+        voice = build(VoicePrompt(ref_codes, ref_text, phonemize_with_dict(ref_text)))
+        with self._lock:
+            self._prompts[key] = voice
+            while len(self._prompts) > self.maxsize:
+                self._prompts.popitem(last=False)
+        return voice
+
+    def __len__(self):
+        return len(self._prompts)
+
+
+class _PrefixKVCache:
+    """
+    Thread-safe LRU of Transformers past_key_values keyed by prompt prefix token IDs.
+
+    Entries are shared; callers must deep-copy one before generating with it.
+    """
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self._caches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, prefix_ids: list[int], build):
+        key = tuple(prefix_ids)
+        with self._lock:
+            cache = self._caches.get(key)
+            if cache is not None:
+                self._caches.move_to_end(key)
+                return cache
+
+        cache = build(prefix_ids)
+        with self._lock:
+            self._caches[key] = cache
+            while len(self._caches) > self.maxsize:
+                self._caches.popitem(last=False)
+        return cache
+
+    def __len__(self):
+        return len(self._caches)
+
+
 def _compile_codec_with_triton(codec):
     """Compile codec with Triton for faster decoding (Windows/Linux compatible)"""
     try:
@@ -89,6 +495,8 @@ class VieNeuTTS:
         backbone_device="cpu",
         codec_repo="neuphonic/neucodec",
         codec_device="cpu",
+        max_batch_size=4,
+        backbone_threads=None,
     ):
         """
         Initialize VieNeu-TTS.
@@ -98,6 +506,8 @@ class VieNeuTTS:
             backbone_device: Device for backbone ('cpu', 'cuda', 'gpu')
             codec_repo: Codec repository
             codec_device: Device for codec
+            max_batch_size: Maximum number of texts generated together by infer_batch
+            backbone_threads: CPU threads of a GGUF backbone (default: llama-cpp's choice)
         """
 
         # Constants
@@ -109,19 +519,29 @@ class VieNeuTTS:
         self.streaming_lookforward = 5
         self.streaming_lookback = 50
         self.streaming_stride_samples = self.streaming_frames_per_chunk * self.hop_length
+        self.max_batch_size = max_batch_size
 
         # Flags
         self._is_quantized_model = False
         self._is_onnx_codec = False
+        # Start each generation from a saved KV cache of the voice prefix
+        self._cache_voice_state = True
 
-        # HF tokenizer
+        # HF tokenizer and vocabulary ID -> codec code table
         self.tokenizer = None
+        self._speech_code_lut = None
+
+        # Prompt prefixes per reference voice, and their past_key_values (Transformers)
+        self._voice_prompts = _VoicePromptCache()
+        self._prefix_kv_cache = _PrefixKVCache()
 
         # Load models
-        self._load_backbone(backbone_repo, backbone_device)
+        self._load_backbone(backbone_repo, backbone_device, backbone_threads)
         self._load_codec(codec_repo, codec_device)
+        # Load eSpeak, the phoneme dictionary and the normalizer now rather than on the first request
+        warmup_phonemizer()
     
-    def _load_backbone(self, backbone_repo, backbone_device):
+    def _load_backbone(self, backbone_repo, backbone_device, backbone_threads=None):
         print(f"Loading backbone from: {backbone_repo} on {backbone_device} ...")
 
         if backbone_repo.lower().endswith("gguf") or "gguf" in backbone_repo.lower():
@@ -132,6 +552,9 @@ class VieNeuTTS:
                     "Failed to import `llama_cpp`. "
                     "Xem hướng dẫn cài đặt llama_cpp_python tại: https://github.com/pnnbao97/VieNeu-TTS"
                 ) from e
+            thread_kwargs = {}
+            if backbone_threads:
+                thread_kwargs = dict(n_threads=backbone_threads, n_threads_batch=backbone_threads)
             self.backbone = Llama.from_pretrained(
                 repo_id=backbone_repo,
                 filename="*.gguf",
@@ -140,12 +563,14 @@ class VieNeuTTS:
                 n_ctx=self.max_context,
                 mlock=True,
                 flash_attn=True if backbone_device == "gpu" else False,
+                **thread_kwargs,
             )
             self._is_quantized_model = True
             
         else:
             from transformers import AutoTokenizer, AutoModelForCausalLM
             self.tokenizer = AutoTokenizer.from_pretrained(backbone_repo)
+            self._speech_code_lut = _build_speech_code_lut(self.tokenizer.get_vocab())
             self.backbone = AutoModelForCausalLM.from_pretrained(backbone_repo).to(
                 torch.device(backbone_device)
             )
@@ -182,7 +607,52 @@ class VieNeuTTS:
             ref_codes = self.codec.encode_code(audio_or_path=wav_tensor).squeeze(0).squeeze(0)
         return ref_codes
 
-    def infer(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str) -> np.ndarray:
+    def prepare_voice(self, ref_codes: np.ndarray | torch.Tensor | list[int], ref_text: str) -> VoicePrompt:
+        """
+        Get the precomputed prompt prefix for a reference voice.
+
+        Computed on first use and cached, so inferring many chunks with the same
+        voice phonemizes and tokenizes the reference only once.
+        """
+        return self._voice_prompts.get_or_create(ref_codes, ref_text, self._tokenize_voice_prompt)
+
+    def _tokenize_voice_prompt(self, voice: VoicePrompt) -> VoicePrompt:
+        if self._is_quantized_model:
+            def encode(text):
+                return self.backbone.tokenize(text.encode("utf-8"), add_bos=False, special=True)
+
+            # BOS as create_completion() would add it to a text prompt
+            head_ids = self.backbone.tokenize(VoicePrompt.PROMPT_HEAD.encode("utf-8"), add_bos=True, special=True)
+            return voice.tokenize(encode, head_ids, encode(VoicePrompt.PROMPT_TAIL))
+
+        def encode(text):
+            return self.tokenizer.encode(text, add_special_tokens=False)
+
+        speech_replace = self.tokenizer.convert_tokens_to_ids("<|SPEECH_REPLACE|>")
+        speech_gen_start = self.tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_START|>")
+        text_replace = self.tokenizer.convert_tokens_to_ids("<|TEXT_REPLACE|>")
+        text_prompt_start = self.tokenizer.convert_tokens_to_ids("<|TEXT_PROMPT_START|>")
+        text_prompt_end = self.tokenizer.convert_tokens_to_ids("<|TEXT_PROMPT_END|>")
+
+        chat = """user: Convert the text to speech:<|TEXT_REPLACE|>\nassistant:<|SPEECH_REPLACE|>"""
+        ids = self.tokenizer.encode(chat)
+        text_replace_idx = ids.index(text_replace)
+        speech_replace_idx = ids.index(speech_replace)
+
+        head_ids = ids[:text_replace_idx] + [text_prompt_start]
+        tail_ids = [text_prompt_end] + ids[text_replace_idx + 1 : speech_replace_idx] + [speech_gen_start]  # noqa
+        return voice.tokenize(encode, head_ids, tail_ids)
+
+    def infer(
+        self,
+        text: str,
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        temperature: float = 1.0,
+        top_k: int = 50,
+        top_p: float = None,
+        seed: int = None,
+    ) -> np.ndarray:
         """
         Perform inference to generate speech from text using the TTS model and reference audio.
 
@@ -190,23 +660,90 @@ class VieNeuTTS:
             text (str): Input text to be converted to speech.
             ref_codes (np.ndarray | torch.tensor): Encoded reference.
             ref_text (str): Reference text for reference audio.
+            temperature (float): Sampling temperature.
+            top_k (int): Sample from the top_k most likely tokens (0 = all).
+            top_p (float): Nucleus sampling threshold (None = backend default).
+            seed (int): Sampling seed; the same inputs and seed give the same speech codes.
         Returns:
             np.ndarray: Generated speech waveform.
         """
+        sampling = dict(temperature=temperature, top_k=top_k, top_p=top_p, seed=seed)
 
-        # Generate tokens
+        # Generate tokens (text for GGUF, codec codes for torch)
+        voice = self.prepare_voice(ref_codes, ref_text)
+        prompt_ids = voice.prompt_ids(phonemize_with_dict(text))
         if self._is_quantized_model:
-            output_str = self._infer_ggml(ref_codes, ref_text, text)
+            output = self._infer_ggml(voice, prompt_ids, sampling)
         else:
-            prompt_ids = self._apply_chat_template(ref_codes, ref_text, text)
-            output_str = self._infer_torch(prompt_ids)
+            output = self._infer_torch(voice, prompt_ids, sampling)
 
         # Decode
-        wav = self._decode(output_str)
+        wav = self._decode(output)
 
         return wav
 
-    def infer_stream(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str) -> Generator[np.ndarray, None, None]:
+    def infer_batch(
+        self,
+        texts: list[str],
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        max_batch_size: int = None,
+        temperature: float = 1.0,
+        top_k: int = 50,
+        top_p: float = None,
+        seed: int = None,
+    ) -> list[np.ndarray]:
+        """
+        Generate speech for several texts with the same reference voice.
+
+        With the PyTorch backend, up to max_batch_size prompts are left-padded
+        and generated together in one batched generate() call, each row stopping
+        at <|SPEECH_GENERATION_END|>. GGUF models generate them one after another.
+        Each batch is decoded with a single codec call.
+
+        With a seed, every text is sampled as if it were generated alone with
+        that seed, whatever else is in the batch.
+
+        Args:
+            texts (list[str]): Input texts to be converted to speech.
+            ref_codes (np.ndarray | torch.tensor): Encoded reference.
+            ref_text (str): Reference text for reference audio.
+            max_batch_size (int): Maximum texts generated at once (defaults to self.max_batch_size).
+            temperature, top_k, top_p, seed: Sampling settings, as in infer().
+        Returns:
+            list[np.ndarray]: Generated speech waveforms, in the order of texts.
+        """
+        sampling = dict(temperature=temperature, top_k=top_k, top_p=top_p, seed=seed)
+        if max_batch_size is None:
+            max_batch_size = self.max_batch_size
+        if not isinstance(texts, list):
+            texts = [texts]
+
+        voice = self.prepare_voice(ref_codes, ref_text)
+        # Phonemize every text in one espeak call
+        texts_phones = phonemize_batch_with_dict(texts)
+
+        all_wavs = []
+        for i in range(0, len(texts), max_batch_size):
+            prompts = [voice.prompt_ids(phones) for phones in texts_phones[i:i + max_batch_size]]
+            if self._is_quantized_model:
+                outputs = [self._infer_ggml(voice, prompt_ids, sampling) for prompt_ids in prompts]
+            else:
+                outputs = self._infer_torch_batch(voice, prompts, sampling)
+            all_wavs.extend(self._decode_batch(outputs))
+
+        return all_wavs
+
+    def infer_stream(
+        self,
+        text: str,
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        temperature: float = 1.0,
+        top_k: int = 50,
+        top_p: float = None,
+        seed: int = None,
+    ) -> Generator[np.ndarray, None, None]:
         """
         Perform streaming inference to generate speech from text using the TTS model and reference audio.
 
@@ -214,19 +751,28 @@ class VieNeuTTS:
             text (str): Input text to be converted to speech.
             ref_codes (np.ndarray | torch.tensor): Encoded reference.
             ref_text (str): Reference text for reference audio.
+            temperature, top_k, top_p, seed: Sampling settings, as in infer().
         Yields:
             np.ndarray: Generated speech waveform.
         """
+        sampling = dict(temperature=temperature, top_k=top_k, top_p=top_p, seed=seed)
 
         if self._is_quantized_model:
-            return self._infer_stream_ggml(ref_codes, ref_text, text)
+            return self._infer_stream_ggml(ref_codes, ref_text, text, sampling)
         else:
-            raise NotImplementedError("Streaming is not implemented for the torch backend!")
+            return self._infer_stream_torch(ref_codes, ref_text, text, sampling)
 
-    def _decode(self, codes: str):
-        """Decode speech tokens to audio waveform."""
-        # Extract speech token IDs using regex
-        speech_ids = [int(num) for num in re.findall(r"<\|speech_(\d+)\|>", codes)]
+    def _decode(self, codes: str | np.ndarray | list[int]):
+        """
+        Decode speech tokens to audio waveform.
+
+        codes is either model output text containing <|speech_N|> tokens
+        (llama-cpp) or the codec codes N themselves.
+        """
+        if isinstance(codes, str):
+            speech_ids = _speech_codes_from_text(codes)
+        else:
+            speech_ids = np.asarray(codes, dtype=np.int32)
         
         if len(speech_ids) == 0:
             raise ValueError(
@@ -236,113 +782,236 @@ class VieNeuTTS:
         
         # Onnx decode
         if self._is_onnx_codec:
-            codes = np.array(speech_ids, dtype=np.int32)[np.newaxis, np.newaxis, :]
+            codes = speech_ids[np.newaxis, np.newaxis, :]
             recon = self.codec.decode_code(codes)
         # Torch decode
         else:
             with torch.no_grad():
-                codes = torch.tensor(speech_ids, dtype=torch.long)[None, None, :].to(
+                codes = torch.from_numpy(speech_ids.astype(np.int64))[None, None, :].to(
                     self.codec.device
                 )
                 recon = self.codec.decode_code(codes).cpu().numpy()
         
         return recon[0, 0, :]
-    
-    def _apply_chat_template(self, ref_codes: list[int], ref_text: str, input_text: str) -> list[int]:
-        input_text = phonemize_with_dict(ref_text) + " " + phonemize_with_dict(input_text)
 
-        speech_replace = self.tokenizer.convert_tokens_to_ids("<|SPEECH_REPLACE|>")
-        speech_gen_start = self.tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_START|>")
-        text_replace = self.tokenizer.convert_tokens_to_ids("<|TEXT_REPLACE|>")
-        text_prompt_start = self.tokenizer.convert_tokens_to_ids("<|TEXT_PROMPT_START|>")
-        text_prompt_end = self.tokenizer.convert_tokens_to_ids("<|TEXT_PROMPT_END|>")
-
-        input_ids = self.tokenizer.encode(input_text, add_special_tokens=False)
-        chat = """user: Convert the text to speech:<|TEXT_REPLACE|>\nassistant:<|SPEECH_REPLACE|>"""
-        ids = self.tokenizer.encode(chat)
-
-        text_replace_idx = ids.index(text_replace)
-        ids = (
-            ids[:text_replace_idx]
-            + [text_prompt_start]
-            + input_ids
-            + [text_prompt_end]
-            + ids[text_replace_idx + 1 :]  # noqa
-        )
+    def _decode_batch(self, codes_list: list[str | np.ndarray]) -> list[np.ndarray]:
+        """Decode several outputs (texts or codec codes) with a single padded codec call."""
+        return _decode_speech_batch(self.codec, codes_list, self.hop_length, self._is_onnx_codec)
+    
+    def _generate_torch(self, voice: VoicePrompt, prompts: list[list[int]], sampling: dict, **kwargs) -> torch.Tensor:
+        """
+        Run generate() on one or more prompts of a voice as a single batch.
 
-        speech_replace_idx = ids.index(speech_replace)
-        codes_str = "".join([f"<|speech_{i}|>" for i in ref_codes])
-        codes = self.tokenizer.encode(codes_str, add_special_tokens=False)
-        ids = ids[:speech_replace_idx] + [speech_gen_start] + list(codes)
+        Prompts are padded to the same length, so the new tokens of every row
+        start at the same column. Generation starts from the voice prefix's
+        cached past_key_values (see _prefix_past_key_values), and the padding
+        goes right after that shared prefix; without a cached prefix this is
+        plain left padding. Rows that end early are padded after
+        <|SPEECH_GENERATION_END|>. max_context counts from the longest prompt,
+        so all rows share its token budget. With a seed, rows are sampled by
+        _SeededSampler instead of generate()'s shared random state.
+        """
+        if sampling["seed"] is None:
+            sample_kwargs = dict(
+                do_sample=True,
+                temperature=sampling["temperature"],
+                top_k=sampling["top_k"],
+                top_p=sampling["top_p"] if sampling["top_p"] is not None else 1.0,
+            )
+        else:
+            from transformers import LogitsProcessorList
+            sample_kwargs = dict(do_sample=False, logits_processor=LogitsProcessorList([_SeededSampler(**sampling)]))
 
-        return ids
+        n_prefix = 0
+        if self._cache_voice_state and voice._can_splice:
+            n_prefix = len(voice.prefix_ids)
+            kwargs["past_key_values"] = self._prefix_past_key_values(voice.prefix_ids, len(prompts))
 
-    def _infer_torch(self, prompt_ids: list[int]) -> str:
-        prompt_tensor = torch.tensor(prompt_ids).unsqueeze(0).to(self.backbone.device)
         speech_end_id = self.tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_END|>")
+        pad_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else speech_end_id
+        width = max(len(prompt_ids) for prompt_ids in prompts)
+        input_ids = torch.tensor([
+            prompt_ids[:n_prefix] + [pad_id] * (width - len(prompt_ids)) + prompt_ids[n_prefix:]
+            for prompt_ids in prompts
+        ])
+        attention_mask = torch.tensor([
+            [1] * n_prefix + [0] * (width - len(prompt_ids)) + [1] * (len(prompt_ids) - n_prefix)
+            for prompt_ids in prompts
+        ])
         with torch.no_grad():
-            output_tokens = self.backbone.generate(
-                prompt_tensor,
+            return self.backbone.generate(
+                input_ids.to(self.backbone.device),
+                attention_mask=attention_mask.to(self.backbone.device),
+                pad_token_id=pad_id,
                 max_length=self.max_context,
                 eos_token_id=speech_end_id,
-                do_sample=True,
-                temperature=1.0,
-                top_k=50,
                 use_cache=True,
                 min_new_tokens=50,
+                **sample_kwargs,
+                **kwargs,
             )
-        input_length = prompt_tensor.shape[-1]
-        output_str = self.tokenizer.decode(
-            output_tokens[0, input_length:].cpu().numpy().tolist(), add_special_tokens=False
-        )
-        return output_str
 
-    def _infer_ggml(self, ref_codes: list[int], ref_text: str, input_text: str) -> str:
-        ref_text = phonemize_with_dict(ref_text)
-        input_text = phonemize_with_dict(input_text)
+    def _prefix_past_key_values(self, prefix_ids: list[int], batch_size: int):
+        """
+        A fresh copy of the past_key_values of prefix_ids, repeated batch_size times.
 
-        codes_str = "".join([f"<|speech_{idx}|>" for idx in ref_codes])
-        prompt = (
-            f"user: Convert the text to speech:<|TEXT_PROMPT_START|>{ref_text} {input_text}"
-            f"<|TEXT_PROMPT_END|>\nassistant:<|SPEECH_GENERATION_START|>{codes_str}"
-        )
+        The prefix (template head and phonemized reference text) is the same
+        for every chunk in a voice, so it is prefilled once and kept in an LRU
+        across voices; generate() then only evaluates the rest of the prompt.
+        The reference codes follow the input text and are evaluated per chunk.
+        """
+        def prefill(prefix_ids):
+            from transformers import DynamicCache
+
+            with torch.no_grad():
+                output = self.backbone(
+                    torch.tensor([prefix_ids], device=self.backbone.device),
+                    past_key_values=DynamicCache(),
+                    use_cache=True,
+                )
+            return output.past_key_values
+
+        past_key_values = copy.deepcopy(self._prefix_kv_cache.get_or_create(prefix_ids, prefill))
+        if batch_size > 1:
+            past_key_values.batch_repeat_interleave(batch_size)
+        return past_key_values
+
+    def _infer_torch(self, voice: VoicePrompt, prompt_ids: list[int], sampling: dict) -> np.ndarray:
+        return self._infer_torch_batch(voice, [prompt_ids], sampling)[0]
+
+    def _infer_torch_batch(self, voice: VoicePrompt, prompts: list[list[int]], sampling: dict) -> list[np.ndarray]:
+        output_tokens = self._generate_torch(voice, prompts, sampling).cpu().numpy()
+        speech_end_id = self.tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_END|>")
+        input_length = max(len(prompt_ids) for prompt_ids in prompts)
+        outputs = []
+        for row in output_tokens[:, input_length:]:
+            # Drop the padding that follows a row that finished early
+            end = np.flatnonzero(row == speech_end_id)
+            if len(end) > 0:
+                row = row[:end[0]]
+            outputs.append(_speech_codes_from_token_ids(row, self._speech_code_lut))
+        return outputs
+
+    def _llama_sampling_kwargs(self, sampling: dict) -> dict:
+        """llama-cpp arguments for the sampling settings; unset ones keep llama-cpp's defaults."""
+        kwargs = dict(temperature=sampling["temperature"], top_k=sampling["top_k"])
+        if sampling["top_p"] is not None:
+            kwargs["top_p"] = sampling["top_p"]
+        if sampling["seed"] is not None:
+            kwargs["seed"] = sampling["seed"]
+        return kwargs
+
+    def _restore_voice_state(self, voice: VoicePrompt):
+        """
+        Make the llama-cpp KV cache start with the voice's prompt prefix.
+
+        llama-cpp only evaluates the part of a prompt after the longest prefix
+        it already holds. The prefix (template head and phonemized reference
+        text) is evaluated once per voice and its context state saved; when
+        the cache holds something else, e.g. after a chunk in another voice,
+        the saved state is copied back instead of evaluating the prefix again.
+        The input text, the template tail and the reference codes that follow
+        it are still evaluated for every chunk.
+        """
+        if not self._cache_voice_state or not voice._can_splice:
+            return
+        from llama_cpp import llama_state_set_data
+
+        llm = self.backbone
+        n_prefix = len(voice.prefix_ids)
+        if llm.n_tokens >= n_prefix and llm.input_ids[:n_prefix].tolist() == voice.prefix_ids:
+            return
+        if voice.llama_state is None:
+            llm.reset()
+            llm.eval(voice.prefix_ids)
+            state = llm.save_state()
+            voice.llama_state = (ctypes.c_uint8 * state.llama_state_size).from_buffer_copy(state.llama_state)
+            return
+        # Llama.load_state() also rewrites the logits buffer (n_batch x vocab
+        # floats), which costs about as much as evaluating the prefix. The
+        # suffix is always evaluated before sampling, so only the context
+        # state and the token bookkeeping are restored.
+        if llama_state_set_data(llm.ctx, voice.llama_state, len(voice.llama_state)) != len(voice.llama_state):
+            raise RuntimeError("Failed to restore llama voice state")
+        llm.input_ids[:n_prefix] = voice.prefix_ids
+        llm.n_tokens = n_prefix
+
+    def _infer_ggml(self, voice: VoicePrompt, prompt_ids: list[int], sampling: dict) -> str:
+        self._restore_voice_state(voice)
         output = self.backbone(
-            prompt,
+            prompt_ids,
             max_tokens=self.max_context,
-            temperature=1.0,
-            top_k=50,
             stop=["<|SPEECH_GENERATION_END|>"],
+            **self._llama_sampling_kwargs(sampling),
         )
         output_str = output["choices"][0]["text"]
         return output_str
 
-    def _infer_stream_ggml(self, ref_codes: torch.Tensor, ref_text: str, input_text: str) -> Generator[np.ndarray, None, None]:
-        ref_text = phonemize_with_dict(ref_text)
-        input_text = phonemize_with_dict(input_text)
+    def _infer_stream_ggml(self, ref_codes: torch.Tensor, ref_text: str, input_text: str, sampling: dict) -> Generator[np.ndarray, None, None]:
+        voice = self.prepare_voice(ref_codes, ref_text)
+        prompt_ids = voice.prompt_ids(phonemize_with_dict(input_text))
 
-        codes_str = "".join([f"<|speech_{idx}|>" for idx in ref_codes])
-        prompt = (
-            f"user: Convert the text to speech:<|TEXT_PROMPT_START|>{ref_text} {input_text}"
-            f"<|TEXT_PROMPT_END|>\nassistant:<|SPEECH_GENERATION_START|>{codes_str}"
+        self._restore_voice_state(voice)
+        stream = self.backbone(
+            prompt_ids,
+            max_tokens=self.max_context,
+            stop=["<|SPEECH_GENERATION_END|>"],
+            stream=True,
+            **self._llama_sampling_kwargs(sampling),
         )
+        yield from self._stream_chunks(voice.ref_codes, (item["choices"][0]["text"] for item in stream))
+
+    def _infer_stream_torch(self, ref_codes: torch.Tensor, ref_text: str, input_text: str, sampling: dict) -> Generator[np.ndarray, None, None]:
+        from transformers import StoppingCriteria, StoppingCriteriaList
+
+        voice = self.prepare_voice(ref_codes, ref_text)
+        prompt_ids = voice.prompt_ids(phonemize_with_dict(input_text))
+
+        stop_event = threading.Event()
+
+        class StopOnEvent(StoppingCriteria):
+            # Lets generation end early when the consumer stops iterating
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full((input_ids.shape[0],), stop_event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+        streamer = _TokenIdStreamer()
+
+        def generate():
+            try:
+                self._generate_torch(
+                    voice, [prompt_ids], sampling, streamer=streamer, stopping_criteria=StoppingCriteriaList([StopOnEvent()])
+                )
+            except BaseException as e:
+                streamer.fail(e)
 
-        audio_cache: list[np.ndarray] = []
-        token_cache: list[str] = [f"<|speech_{idx}|>" for idx in ref_codes]
-        n_decoded_samples: int = 0
+        thread = threading.Thread(target=generate, daemon=True)
+        thread.start()
+        try:
+            deltas = (_speech_codes_from_token_ids(token_ids, self._speech_code_lut) for token_ids in streamer)
+            yield from self._stream_chunks(voice.ref_codes, deltas)
+        finally:
+            stop_event.set()
+            thread.join()
+
+    def _stream_chunks(self, ref_codes: list[int], deltas) -> Generator[np.ndarray, None, None]:
+        """
+        Decode a token stream into audio chunks as it is generated.
+
+        deltas yields the newly generated output: text (llama-cpp) or codec codes.
+        Every streaming_frames_per_chunk codes are decoded with lookback and
+        lookforward context and joined by overlap-add.
+        """
+        overlap_add = _StreamingOverlapAdd(stride=self.streaming_stride_samples)
+        token_cache = _SpeechCodeBuffer(ref_codes, capacity=len(ref_codes) + self.max_context)
         n_decoded_tokens: int = len(ref_codes)
 
-        for item in self.backbone(
-            prompt,
-            max_tokens=self.max_context,
-            temperature=1.0,
-            top_k=50,
-            stop=["<|SPEECH_GENERATION_END|>"],
-            stream=True
-        ):
-            output_str = item["choices"][0]["text"]
-            token_cache.append(output_str)
+        for delta in deltas:
+            if isinstance(delta, str):
+                token_cache.extend_text(delta)
+            else:
+                token_cache.extend(delta)
 
-            if len(token_cache[n_decoded_tokens:]) >= self.streaming_frames_per_chunk + self.streaming_lookforward:
+            while len(token_cache) - n_decoded_tokens >= self.streaming_frames_per_chunk + self.streaming_lookforward:
 
                 # decode chunk
                 tokens_start = max(
@@ -365,19 +1034,11 @@ class VieNeuTTS:
                     + (self.streaming_frames_per_chunk + 2 * self.streaming_overlap_frames) * self.hop_length
                 )
                 curr_codes = token_cache[tokens_start:tokens_end]
-                recon = self._decode("".join(curr_codes))
+                recon = self._decode(curr_codes)
                 recon = recon[sample_start:sample_end]
-                audio_cache.append(recon)
 
                 # postprocess
-                processed_recon = _linear_overlap_add(
-                    audio_cache, stride=self.streaming_stride_samples
-                )
-                new_samples_end = len(audio_cache) * self.streaming_stride_samples
-                processed_recon = processed_recon[
-                    n_decoded_samples:new_samples_end
-                ]
-                n_decoded_samples = new_samples_end
+                processed_recon = overlap_add.add(recon)
                 n_decoded_tokens += self.streaming_frames_per_chunk
                 yield processed_recon
 
@@ -396,12 +1057,10 @@ class VieNeuTTS:
                 - self.streaming_overlap_frames
             ) * self.hop_length
             curr_codes = token_cache[tokens_start:]
-            recon = self._decode("".join(curr_codes))
+            recon = self._decode(curr_codes)
             recon = recon[sample_start:]
-            audio_cache.append(recon)
 
-            processed_recon = _linear_overlap_add(audio_cache, stride=self.streaming_stride_samples)
-            processed_recon = processed_recon[n_decoded_samples:]
+            processed_recon = np.concatenate([overlap_add.add(recon), overlap_add.flush()], axis=-1)
             yield processed_recon
 
 
@@ -460,6 +1119,7 @@ class FastVieNeuTTS:
         self.max_batch_size = max_batch_size
         
         self._ref_cache = {}
+        self._voice_prompts = _VoicePromptCache()
         
         self.stored_dict = defaultdict(dict)
         
@@ -467,6 +1127,9 @@ class FastVieNeuTTS:
         self._is_onnx_codec = False
         self._triton_enabled = False
         
+        # Vocabulary ID -> codec code table (None: parse response text instead)
+        self._speech_code_lut = None
+        
         # Load models
         self._load_backbone_lmdeploy(backbone_repo, memory_util, tp, enable_prefix_caching, quant_policy)
         self._load_codec(codec_repo, codec_device, enable_triton)
@@ -499,6 +1162,12 @@ class FastVieNeuTTS:
         
         self.backbone = pipeline(repo, backend_config=backend_config)
         
+        try:
+            from transformers import AutoTokenizer
+            self._speech_code_lut = _build_speech_code_lut(AutoTokenizer.from_pretrained(repo).get_vocab())
+        except Exception as e:
+            print(f"   ⚠️ Speech token table unavailable, decoding from response text: {e}")
+        
         self.gen_config = GenerationConfig(
             top_p=0.95,
             top_k=50,
@@ -609,15 +1278,18 @@ class FastVieNeuTTS:
         
         return user_id
     
-    def _decode(self, codes: str):
-        """Decode speech tokens to audio waveform"""
+    def _decode(self, codes: str | np.ndarray | list[int]):
+        """Decode speech tokens (response text or codec codes) to audio waveform"""
         # Debug: Print raw output
         print(f"\n🔍 DEBUG _decode():")
         print(f"  Input codes (first 500 chars): {codes[:500]}")
         print(f"  Input codes (last 200 chars): {codes[-200:]}")
         print(f"  Total length: {len(codes)}")
         
-        speech_ids = [int(num) for num in re.findall(r"<\|speech_(\d+)\|>", codes)]
+        if isinstance(codes, str):
+            speech_ids = _speech_codes_from_text(codes)
+        else:
+            speech_ids = np.asarray(codes, dtype=np.int32)
         
         print(f"  Found {len(speech_ids)} speech tokens")
         if len(speech_ids) > 0:
@@ -628,62 +1300,68 @@ class FastVieNeuTTS:
             raise ValueError("No valid speech tokens found in output")
         
         if self._is_onnx_codec:
-            codes = np.array(speech_ids, dtype=np.int32)[np.newaxis, np.newaxis, :]
+            codes = speech_ids[np.newaxis, np.newaxis, :]
             recon = self.codec.decode_code(codes)
         else:
             with torch.no_grad():
-                codes = torch.tensor(speech_ids, dtype=torch.long)[None, None, :].to(
+                codes = torch.from_numpy(speech_ids.astype(np.int64))[None, None, :].to(
                     self.codec.device
                 )
                 recon = self.codec.decode_code(codes).cpu().numpy()
         
         return recon[0, 0, :]
     
-    def _decode_batch(self, codes_list: list[str], max_workers: int = None):
+    def _response_codes(self, response) -> str | np.ndarray:
+        """Codec codes of a LMDeploy response, from its token IDs when possible"""
+        token_ids = getattr(response, 'token_ids', None)
+        if token_ids and self._speech_code_lut is not None:
+            return _speech_codes_from_token_ids(token_ids, self._speech_code_lut)
+        return response.text
+    
+    def _decode_batch(self, codes_list: list[str | np.ndarray]) -> list[np.ndarray]:
         """
-        Decode multiple code strings in parallel.
+        Decode multiple outputs with a single codec call.
         
         Args:
-            codes_list: List of code strings to decode
-            max_workers: Number of parallel workers (auto-tuned if None)
+            codes_list: List of response texts or codec code arrays to decode
             
         Returns:
             List of decoded audio arrays
         """
-        # Auto-tune workers based on GPU memory and batch size
-        if max_workers is None:
-            if torch.cuda.is_available():
-                gpu_mem_gb = torch.cuda.get_device_properties(0).total_memory / 1e9
-                # 1 worker per 4GB VRAM, max 4 workers
-                max_workers = min(max(1, int(gpu_mem_gb / 4)), 4)
-            else:
-                max_workers = 2
-        
-        # For small batches, use sequential to avoid overhead
-        if len(codes_list) <= 2:
-            return [self._decode(codes) for codes in codes_list]
+        return _decode_speech_batch(self.codec, codes_list, self.hop_length, self._is_onnx_codec)
+    
+    def prepare_voice(self, ref_codes: np.ndarray | torch.Tensor | list[int], ref_text: str) -> VoicePrompt:
+        """
+        Get the precomputed prompt prefix for a reference voice.
         
-        # Parallel decoding with controlled workers
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(self._decode, codes) for codes in codes_list]
-            results = [f.result() for f in futures]
-        return results
+        LMDeploy tokenizes prompts itself, so this caches the prompt text around
+        the input text (phonemized reference text and reference codes).
+        """
+        return self._voice_prompts.get_or_create(ref_codes, ref_text, lambda voice: voice)
     
     def _format_prompt(self, ref_codes: list[int], ref_text: str, input_text: str) -> str:
         """Format prompt for LMDeploy"""
-        ref_text_phones = phonemize_with_dict(ref_text)
-        input_text_phones = phonemize_with_dict(input_text)
-        
-        codes_str = "".join([f"<|speech_{idx}|>" for idx in ref_codes])
-        
-        prompt = (
-            f"user: Convert the text to speech:<|TEXT_PROMPT_START|>{ref_text_phones} {input_text_phones}"
-            f"<|TEXT_PROMPT_END|>\nassistant:<|SPEECH_GENERATION_START|>{codes_str}"
-        )
-        
-        return prompt
+        return self.prepare_voice(ref_codes, ref_text).prompt(phonemize_with_dict(input_text))
     
-    def infer(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str) -> np.ndarray:
+    def _generation_config(self, temperature: float, top_k: int, top_p: float, seed: int):
+        """self.gen_config with the sampling settings of one call; top_p=None keeps its top_p"""
+        changes = dict(temperature=temperature, top_k=top_k)
+        if top_p is not None:
+            changes["top_p"] = top_p
+        if seed is not None:
+            changes["random_seed"] = seed
+        return dataclasses.replace(self.gen_config, **changes)
+    
+    def infer(
+        self,
+        text: str,
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        temperature: float = 1.0,
+        top_k: int = 50,
+        top_p: float = None,
+        seed: int = None,
+    ) -> np.ndarray:
         """
         Single inference.
         
@@ -691,6 +1369,10 @@ class FastVieNeuTTS:
             text: Input text to synthesize
             ref_codes: Encoded reference audio codes
             ref_text: Reference text for reference audio
+            temperature: Sampling temperature
+            top_k: Sample from the top_k most likely tokens
+            top_p: Nucleus sampling threshold (None = 0.95)
+            seed: Sampling seed; the same inputs and seed give the same speech codes
             
         Returns:
             Generated speech waveform as numpy array
@@ -717,7 +1399,8 @@ class FastVieNeuTTS:
         # CRITICAL FIX: Try with do_preprocess=True to let tokenizer handle special tokens
         print(f"  ⚠️ Running WITH do_preprocess=True to let LMDeploy handle tokenization")
         
-        responses = self.backbone([prompt], gen_config=self.gen_config, do_preprocess=True)
+        gen_config = self._generation_config(temperature, top_k, top_p, seed)
+        responses = self.backbone([prompt], gen_config=gen_config, do_preprocess=True)
         output_str = responses[0].text
         
         print(f"  📥 Response received:")
@@ -726,11 +1409,21 @@ class FastVieNeuTTS:
         print(f"  Response finish_reason: {responses[0].finish_reason if hasattr(responses[0], 'finish_reason') else 'N/A'}")
         
         # Decode to audio
-        wav = self._decode(output_str)
+        wav = self._decode(self._response_codes(responses[0]))
         
         return wav
     
-    def infer_batch(self, texts: list[str], ref_codes: np.ndarray | torch.Tensor, ref_text: str, max_batch_size: int = None) -> list[np.ndarray]:
+    def infer_batch(
+        self,
+        texts: list[str],
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        max_batch_size: int = None,
+        temperature: float = 1.0,
+        top_k: int = 50,
+        top_p: float = None,
+        seed: int = None,
+    ) -> list[np.ndarray]:
         """
         Batch inference for multiple texts.
         
@@ -739,12 +1432,14 @@ class FastVieNeuTTS:
             ref_codes: Encoded reference audio codes
             ref_text: Reference text for reference audio
             max_batch_size: Maximum chunks to process at once (prevent GPU overload)
+            temperature, top_k, top_p, seed: Sampling settings, as in infer()
             
         Returns:
             List of generated speech waveforms
         """
         if max_batch_size is None:
             max_batch_size = self.max_batch_size
+        gen_config = self._generation_config(temperature, top_k, top_p, seed)
             
         if not isinstance(texts, list):
             texts = [texts]
@@ -756,25 +1451,23 @@ class FastVieNeuTTS:
         
         all_wavs = []
         
+        voice = self.prepare_voice(ref_codes, ref_text)
+        # Phonemize every chunk in one espeak call
+        texts_phones = phonemize_batch_with_dict(texts)
+        
         # Process in smaller batches to avoid GPU OOM
         for i in range(0, len(texts), max_batch_size):
-            batch_texts = texts[i:i+max_batch_size]
+            batch_phones = texts_phones[i:i+max_batch_size]
             
             # Format prompts for this batch
-            prompts = [self._format_prompt(ref_codes, ref_text, text) for text in batch_texts]
+            prompts = [voice.prompt(phones) for phones in batch_phones]
             
             # Batch generation with LMDeploy
-            responses = self.backbone(prompts, gen_config=self.gen_config, do_preprocess=False)
+            responses = self.backbone(prompts, gen_config=gen_config, do_preprocess=False)
             
-            # Decode outputs (with smart parallelization)
-            batch_codes = [response.text for response in responses]
-            
-            # Auto-tune parallel workers based on batch size
-            if len(batch_codes) > 3:
-                batch_wavs = self._decode_batch(batch_codes)
-            else:
-                # Sequential for small batches (less overhead)
-                batch_wavs = [self._decode(codes) for codes in batch_codes]
+            # Decode all outputs of the batch in one codec call
+            batch_codes = [self._response_codes(response) for response in responses]
+            batch_wavs = self._decode_batch(batch_codes)
             
             all_wavs.extend(batch_wavs)
             
@@ -785,7 +1478,16 @@ class FastVieNeuTTS:
         
         return all_wavs
     
-    def infer_stream(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str) -> Generator[np.ndarray, None, None]:
+    def infer_stream(
+        self,
+        text: str,
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        temperature: float = 1.0,
+        top_k: int = 50,
+        top_p: float = None,
+        seed: int = None,
+    ) -> Generator[np.ndarray, None, None]:
         """
         Streaming inference with low latency.
         
@@ -793,10 +1495,12 @@ class FastVieNeuTTS:
             text: Input text to synthesize
             ref_codes: Encoded reference audio codes
             ref_text: Reference text for reference audio
+            temperature, top_k, top_p, seed: Sampling settings, as in infer()
             
         Yields:
             Audio chunks as numpy arrays
         """
+        gen_config = self._generation_config(temperature, top_k, top_p, seed)
         if isinstance(ref_codes, torch.Tensor):
             ref_codes = ref_codes.cpu().numpy()
         if isinstance(ref_codes, np.ndarray):
@@ -804,75 +1508,18 @@ class FastVieNeuTTS:
         
         prompt = self._format_prompt(ref_codes, ref_text, text)
         
-        audio_cache = []
-        token_cache = [f"<|speech_{idx}|>" for idx in ref_codes]
-        n_decoded_samples = 0
-        n_decoded_tokens = len(ref_codes)
+        def deltas():
+            for response in self.backbone.stream_infer([prompt], gen_config=gen_config, do_preprocess=False):
+                # Each streamed response carries only the tokens generated since the previous one
+                if response.token_ids and self._speech_code_lut is not None:
+                    yield _speech_codes_from_token_ids(response.token_ids, self._speech_code_lut)
+                else:
+                    yield response.text
         
-        for response in self.backbone.stream_infer([prompt], gen_config=self.gen_config, do_preprocess=False):
-            output_str = response.text
-            
-            # Extract new tokens
-            new_tokens = output_str[len("".join(token_cache[len(ref_codes):])):] if len(token_cache) > len(ref_codes) else output_str
-            
-            if new_tokens:
-                token_cache.append(new_tokens)
-            
-            # Check if we have enough tokens to decode a chunk
-            if len(token_cache[n_decoded_tokens:]) >= self.streaming_frames_per_chunk + self.streaming_lookforward:
-                
-                # Decode chunk with context
-                tokens_start = max(
-                    n_decoded_tokens - self.streaming_lookback - self.streaming_overlap_frames,
-                    0
-                )
-                tokens_end = (
-                    n_decoded_tokens
-                    + self.streaming_frames_per_chunk
-                    + self.streaming_lookforward
-                    + self.streaming_overlap_frames
-                )
-                sample_start = (n_decoded_tokens - tokens_start) * self.hop_length
-                sample_end = (
-                    sample_start
-                    + (self.streaming_frames_per_chunk + 2 * self.streaming_overlap_frames) * self.hop_length
-                )
-                
-                curr_codes = token_cache[tokens_start:tokens_end]
-                recon = self._decode("".join(curr_codes))
-                recon = recon[sample_start:sample_end]
-                audio_cache.append(recon)
-                
-                # Overlap-add processing
-                processed_recon = _linear_overlap_add(
-                    audio_cache, stride=self.streaming_stride_samples
-                )
-                new_samples_end = len(audio_cache) * self.streaming_stride_samples
-                processed_recon = processed_recon[n_decoded_samples:new_samples_end]
-                n_decoded_samples = new_samples_end
-                n_decoded_tokens += self.streaming_frames_per_chunk
-                
-                yield processed_recon
-        
-        # Final chunk
-        remaining_tokens = len(token_cache) - n_decoded_tokens
-        if remaining_tokens > 0:
-            tokens_start = max(
-                len(token_cache) - (self.streaming_lookback + self.streaming_overlap_frames + remaining_tokens),
-                0
-            )
-            sample_start = (
-                len(token_cache) - tokens_start - remaining_tokens - self.streaming_overlap_frames
-            ) * self.hop_length
-            
-            curr_codes = token_cache[tokens_start:]
-            recon = self._decode("".join(curr_codes))
-            recon = recon[sample_start:]
-            audio_cache.append(recon)
-            
-            processed_recon = _linear_overlap_add(audio_cache, stride=self.streaming_stride_samples)
-            processed_recon = processed_recon[n_decoded_samples:]
-            yield processed_recon
+        yield from self._stream_chunks(ref_codes, deltas())
+    
+    # Same chunking and overlap-add as VieNeuTTS, with this class's streaming settings
+    _stream_chunks = VieNeuTTS._stream_chunks
     
     def cleanup_memory(self):
         """Clean up GPU memory"""
@@ -891,7 +1538,9 @@ class FastVieNeuTTS:
         return {
             'triton_enabled': self._triton_enabled,
             'cached_references': len(self._ref_cache),
+            'cached_voice_prompts': len(self._voice_prompts),
             'active_sessions': len(self.stored_dict),
             'kv_quant': self.gen_config.__dict__.get('quant_policy', 0),
             'prefix_caching': True,  # Always enabled in our config
+            'phoneme_cache': phoneme_cache_info(),
         }
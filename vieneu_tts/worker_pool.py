@@ -0,0 +1,246 @@
+"""
+Multi-process CPU inference of a GGUF backbone.
+
+llama.cpp stops scaling well past a handful of threads per sequence, so a
+many-core CPU is better used by several independent generations at once.
+GGUFWorkerPool spawns n_workers processes, each pinned to its own share of
+the cores and running a VieNeuTTS with as many llama.cpp threads as it has
+cores. The GGUF file is memory-mapped by every worker, so its weights sit
+in the page cache once. Texts of an infer_batch() call fan out across idle
+workers; concurrent callers (e.g. a BatchScheduler with several worker
+threads) each get a worker of their own.
+"""
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Generator
+
+import numpy as np
+import torch
+
+
+def available_cores() -> list[int]:
+    """CPU cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cores(n_workers: int, cores: list[int] = None) -> list[list[int]]:
+    """Split cores into n_workers contiguous groups of (nearly) equal size."""
+    if cores is None:
+        cores = available_cores()
+    if not 1 <= n_workers <= len(cores):
+        raise ValueError(f"n_workers must be between 1 and the {len(cores)} available cores, got {n_workers}")
+    return [group.tolist() for group in np.array_split(np.asarray(cores), n_workers)]
+
+
+def _send_error(conn, error: Exception):
+    try:
+        conn.send(("error", error))
+    except Exception:
+        # Not picklable
+        conn.send(("error", RuntimeError(f"{type(error).__name__}: {error}")))
+
+
+def _worker_main(conn, cores: list[int], tts_kwargs: dict):
+    """Entry point of a worker process: pin to cores, load the model, then serve requests from conn."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    # Codec threads stay within the worker's own cores, too
+    torch.set_num_threads(len(cores))
+    try:
+        from vieneu_tts import VieNeuTTS
+
+        tts = VieNeuTTS(backbone_device="cpu", backbone_threads=len(cores), **tts_kwargs)
+    except Exception as e:
+        _send_error(conn, e)
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        if message == "cancel":
+            # Arrived after its stream had already finished
+            continue
+
+        method, args, kwargs = message
+        try:
+            if method == "infer_stream":
+                for audio in tts.infer_stream(*args, **kwargs):
+                    conn.send(("part", audio))
+                    if conn.poll() and conn.recv() == "cancel":
+                        break
+                conn.send(("done", None))
+            elif method == "encode_reference":
+                conn.send(("ok", np.asarray(tts.encode_reference(*args, **kwargs))))
+            else:
+                conn.send(("ok", getattr(tts, method)(*args, **kwargs)))
+        except Exception as e:
+            _send_error(conn, e)
+
+
+class GGUFWorkerPool:
+    """
+    VieNeuTTS-compatible backend running a GGUF backbone in n_workers CPU processes.
+
+    infer() and infer_stream() run on one idle worker, waiting for one if all
+    are busy; infer_batch() spreads its texts over all of them. Each worker
+    gets a contiguous group of the given cores (default: all this process may
+    use) and loads the model once at startup. Call close() to stop them.
+    Workers are spawned, so the main script must guard its entry point with
+    if __name__ == "__main__".
+    """
+
+    def __init__(
+        self,
+        backbone_repo="pnnbao-ump/VieNeu-TTS-q4-gguf",
+        codec_repo="neuphonic/neucodec-onnx-decoder",
+        codec_device="cpu",
+        n_workers=2,
+        cores=None,
+    ):
+        if "gguf" not in backbone_repo.lower():
+            raise ValueError(f"GGUFWorkerPool needs a GGUF backbone, got {backbone_repo}")
+        self.sample_rate = 24_000
+        self.n_workers = n_workers
+        # Texts of one infer_batch() call generated at once
+        self.max_batch_size = n_workers
+        self.worker_cores = split_cores(n_workers, cores)
+
+        tts_kwargs = dict(backbone_repo=backbone_repo, codec_repo=codec_repo, codec_device=codec_device)
+        # Workers must not inherit the parent's threads, e.g. a running scheduler
+        context = multiprocessing.get_context("spawn")
+        self._conns = []
+        self._processes = []
+        self._idle = queue.Queue()
+        self._closed = False
+
+        print(f"🧵 Starting {n_workers} GGUF workers for {backbone_repo}...")
+        try:
+            for worker_cores in self.worker_cores:
+                parent_conn, child_conn = context.Pipe()
+                process = context.Process(
+                    target=_worker_main, args=(child_conn, worker_cores, tts_kwargs), daemon=True
+                )
+                process.start()
+                child_conn.close()
+                self._conns.append(parent_conn)
+                self._processes.append(process)
+            # Workers load concurrently; wait until every one is ready
+            for index, conn in enumerate(self._conns):
+                self._receive(conn)
+                self._idle.put(index)
+        except Exception:
+            self.close()
+            raise
+        self._executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="gguf-worker-pool")
+        sizes = sorted({len(worker_cores) for worker_cores in self.worker_cores})
+        print(f"   ✅ {n_workers} workers ready ({'/'.join(map(str, sizes))} cores each)")
+
+    @staticmethod
+    def _receive(conn):
+        try:
+            kind, value = conn.recv()
+        except EOFError:
+            raise RuntimeError("GGUF worker process exited") from None
+        if kind == "error":
+            raise value
+        return kind, value
+
+    def _call(self, method: str, *args, **kwargs):
+        index = self._idle.get()
+        try:
+            conn = self._conns[index]
+            conn.send((method, args, kwargs))
+            _, value = self._receive(conn)
+            return value
+        finally:
+            self._idle.put(index)
+
+    def encode_reference(self, ref_audio_path: str | Path):
+        """Encode reference audio to codes, on a worker's codec"""
+        return torch.from_numpy(self._call("encode_reference", str(ref_audio_path)))
+
+    def infer(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str, **sampling) -> np.ndarray:
+        """VieNeuTTS.infer() on an idle worker."""
+        return self._call("infer", text, np.asarray(ref_codes), ref_text, **sampling)
+
+    def infer_batch(self, texts: list[str], ref_codes: np.ndarray | torch.Tensor, ref_text: str,
+                    max_batch_size: int = None, **sampling) -> list[np.ndarray]:
+        """
+        VieNeuTTS.infer_batch(), one text per worker at a time.
+
+        With a seed, every text is sampled as if it were generated alone
+        with that seed. max_batch_size is accepted for compatibility; the
+        number of workers bounds the parallelism.
+        """
+        if not isinstance(texts, list):
+            texts = [texts]
+        ref_codes = np.asarray(ref_codes)
+        return list(self._executor.map(lambda text: self.infer(text, ref_codes, ref_text, **sampling), texts))
+
+    def infer_stream(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str,
+                     **sampling) -> Generator[np.ndarray, None, None]:
+        """
+        VieNeuTTS.infer_stream() on an idle worker, which it keeps until the stream ends.
+
+        Closing the generator early stops the worker after its current part.
+        """
+        index = self._idle.get()
+        conn = self._conns[index]
+        finished = False
+        try:
+            conn.send(("infer_stream", (text, np.asarray(ref_codes), ref_text), sampling))
+            while True:
+                kind, audio = self._receive(conn)
+                if kind == "done":
+                    finished = True
+                    return
+                yield audio
+        except Exception:
+            # The worker has reported its error and is idle again
+            finished = True
+            raise
+        finally:
+            if not finished:
+                conn.send("cancel")
+                try:
+                    # Drop the parts already on their way
+                    while self._receive(conn)[0] != "done":
+                        pass
+                except Exception:
+                    # The stream failed before it saw the cancel; nobody wants its error
+                    pass
+            self._idle.put(index)
+
+    def close(self):
+        """Stop the worker processes."""
+        if self._closed:
+            return
+        self._closed = True
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        executor = getattr(self, "_executor", None)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()